@@ -1,15 +1,90 @@
 from fastapi import FastAPI, Request, HTTPException, Response, Depends
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from starlette.background import BackgroundTask
 
+import asyncio
+import uvicorn
 import yaml
 import httpx
+import json
 import os
+import urllib.parse
+
+from utils.upstream_clients import UpstreamClients
+from utils.headers import filter_hop_by_hop, with_headers
+from utils.token_cache import TokenVerificationCache
+from utils.response_cache import ResponseCache, RelayResponse, CONDITIONAL_HEADERS, NOT_MODIFIED_HEADERS
+from utils.api_docs import ApiDocs
+from utils.compression import CompressionMiddleware, etag_matches
+from utils.metrics import MetricsMiddleware, registry, track_cache, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 # GLOBAL
 COLLECTION_SERVICE_URL = os.getenv("COLLECTION_SERVICE_URL", "http://collection-service:8000")
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL", "http://auth-service:3000")
 EXPLORATION_SERVICE_URL = os.getenv("EXPLORATION_SERVICE_URL", "http://exploration-service:8000")
+PROXY_STREAMING = os.getenv("PROXY_STREAMING", "true").lower() == "true"
+
+# INTERNAL LISTENER
+# Metrics and gateway stats are served on their own port, which is not published outside the network (0 disables)
+GATEWAY_INTERNAL_HOST = os.getenv("GATEWAY_INTERNAL_HOST", "0.0.0.0")
+GATEWAY_INTERNAL_PORT = int(os.getenv("GATEWAY_INTERNAL_PORT", "9090"))
+
+# JWT VERIFICATION CACHE
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL", "300"))
+JWT_LOCAL_VERIFY = os.getenv("JWT_LOCAL_VERIFY", "false").lower() == "true"
+JWT_SECRET = os.getenv("JWT_SECRET")
+
+# RESPONSE CACHE
+# Gateway path prefix -> [ttl seconds, "shared" | "user"], the longest prefix wins, ttl 0 disables
+RESPONSE_CACHE_RULES = {
+    "/collection/": [300, "shared"],
+    "/collection/catalog/": [0, "shared"],
+    "/collection/metrics": [0, "shared"],
+    "/exploration/metrics": [0, "shared"],
+    "/exploration/latest": [5, "shared"],
+    "/exploration/planets/": [30, "shared"],
+    "/exploration/planets/all": [10, "shared"],
+    "/exploration/planets/user/": [10, "shared"],
+}
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_RULES.update(json.loads(os.getenv("RESPONSE_CACHE_RULES", "{}")))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# API DOCS
+DOCS_CACHE_MAX_AGE = int(os.getenv("DOCS_CACHE_MAX_AGE", "86400"))
+# Merge the backends' own /openapi.json into the served document, refreshed every interval
+DOCS_MERGE_BACKENDS = os.getenv("DOCS_MERGE_BACKENDS", "false").lower() == "true"
+DOCS_REFRESH_INTERVAL = float(os.getenv("DOCS_REFRESH_INTERVAL", "300"))
+DOCS_BACKENDS = {"/collection": "collection", "/exploration": "exploration"}
+
+# UPSTREAM CLIENTS
+upstream_clients = UpstreamClients({
+    "collection": COLLECTION_SERVICE_URL,
+    "auth": AUTH_SERVICE_URL,
+    "exploration": EXPLORATION_SERVICE_URL,
+})
+
+token_cache = TokenVerificationCache(
+    max_entries=JWT_CACHE_SIZE,
+    max_ttl=JWT_CACHE_MAX_TTL,
+    secret=JWT_SECRET if JWT_LOCAL_VERIFY else None,
+)
+
+response_cache = ResponseCache(RESPONSE_CACHE_RULES, max_bytes=RESPONSE_CACHE_MAX_BYTES)
+
+track_cache("jwt", token_cache.stats)
+track_cache("response", response_cache.stats)
+
+# Rendered and compressed once here, requests only pick a precomputed variant
+with open("api-doc.yaml", "r") as file:
+    api_docs = ApiDocs(yaml.safe_load(file))
+
+docs_refresh_task = None
+internal_server = None
+internal_server_task = None
 
 # GATEWAY HELPER FUNCTIONS
 async def verify_jwt(request: Request):
@@ -17,39 +92,195 @@ async def verify_jwt(request: Request):
     if not token:
         raise HTTPException(status_code=401, detail="Authorization token is missing")
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(f"{AUTH_SERVICE_URL}/verify", headers={"Authorization": token})
-
-            if response.status_code != 200:
-                raise HTTPException(status_code=401, detail="Invalid token")
-            
-            user_info = response.json().get("user")
-            if not user_info or "username" not in user_info:
-                raise HTTPException(status_code=401, detail="Invalid user info")
-            return user_info["username"]
+    return await token_cache.verify(token, verify_jwt_remote)
+
+async def verify_jwt_remote(token: str):
+    try:
+        response = await upstream_clients.request("auth", "GET", f"{AUTH_SERVICE_URL}/verify", headers={"Authorization": token})
+
+        if response.status_code != 200:
+            raise HTTPException(status_code=401, detail="Invalid token")
         
-        except httpx.HTTPError as exc:
-            raise HTTPException(status_code=500, detail="Authentication service error")
+        user_info = response.json().get("user")
+        if not user_info or "username" not in user_info:
+            raise HTTPException(status_code=401, detail="Invalid user info")
+        return user_info["username"]
+    
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=500, detail="Authentication service error")
 
 # PROXY
-async def proxy_request(request: Request, target_url: str, headers=None):
+# Upstream paths only reachable from inside the network
+INTERNAL_PATHS = {
+    "collection": ("/catalog/stats", "/metrics"),
+    "exploration": ("/admin", "/metrics", "/ready"),
+}
+
+def public_path(upstream: str, path: str) -> str:
+    # `path` is percent-decoded, a decoded "?" or "#" right after a prefix would end it upstream
+    # httpx resolves dot segments before sending, so "x/../admin" would reach /admin upstream
+    segments = path.split("/")
+    if "." in segments or ".." in segments:
+        raise HTTPException(status_code=400, detail="Invalid path")
+    normalized = "/" + "/".join(segment for segment in segments if segment)
+    for prefix in INTERNAL_PATHS.get(upstream, ()):
+        if normalized == prefix or (normalized.startswith(prefix) and normalized[len(prefix)] in "/?#"):
+            raise HTTPException(status_code=404, detail="Not Found")
+    return path
+
+def upstream_url(base_url: str, path: str, request: Request) -> str:
+    # `path` is the decoded path public_path checked, quoted again so "?", "#" and "%" stay part of it
+    target_url = f"{base_url}/{urllib.parse.quote(path, safe='/')}".lstrip("/")
+    # The client's query string is forwarded untouched, request.url would re-split it around a decoded "?"
+    query = request.scope.get("query_string", b"").decode("latin-1")
+    return f"{target_url}?{query}" if query else target_url
+
+async def proxy_request(request: Request, upstream: str, target_url: str, headers=None):
+    # Server-Sent Events are always relayed unbuffered, whatever the proxy mode
+    if PROXY_STREAMING or "text/event-stream" in request.headers.get("accept", ""):
+        return await proxy_streaming_request(request, upstream, target_url, headers)
+    return await proxy_buffered_request(request, upstream, target_url, headers)
+
+async def cached_proxy_request(request: Request, upstream: str, target_url: str, username: str, headers=None):
+    path = request.url.path
+    if request.method != "GET":
+        response = await proxy_request(request, upstream, target_url, headers)
+        if response.status_code < 400:
+            response_cache.invalidate(f"/{path.split('/')[1]}/")
+        return response
+
+    rule = response_cache.rule_for(path) if RESPONSE_CACHE_ENABLED else None
+    if rule is None or "text/event-stream" in request.headers.get("accept", ""):
+        return await proxy_request(request, upstream, target_url, headers)
+
+    ttl, scope = rule
+    key = response_cache.cache_key(request.method, path, request.url.query, username if scope == "user" else "shared")
+    forwarded = [(name, value) for name, value in filter_hop_by_hop(headers or request.headers) if name.lower() not in CONDITIONAL_HEADERS]
+
+    async def load():
+        response = await upstream_clients.open_stream(upstream, "GET", target_url, headers=forwarded)
+        size = response.headers.get("content-length")
+        # Streamed (e.g. NDJSON) and oversized bodies keep flowing through, never buffered to be discarded
+        if not (size and size.isdigit() and int(size) <= response_cache.max_entry_bytes):
+            raise RelayResponse(response, lambda: upstream_clients.close_stream(upstream, response))
+        try:
+            content = await response.aread()
+        finally:
+            await upstream_clients.close_stream(upstream, response)
+        # Set-Cookie is never replayed from the cache, so one value per header is all it keeps
+        return response.status_code, dict(filter_hop_by_hop(response.headers, decoded=True)), content
+
+    try:
+        entry, cache_status = await response_cache.fetch(key, ttl, load)
+    except RelayResponse as relay:
+        response = relay.claim()
+        if response is None:
+            return await proxy_streaming_request(request, upstream, target_url, headers)
+        return relay_response(upstream, response)
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=500, detail=f"Gateway error: {str(exc)}")
+
+    content, headers = entry.select(request.headers.get("accept-encoding"))
+    if response_cache.not_modified(entry, request.headers.get("if-none-match"), headers["etag"]):
+        not_modified = {name: value for name, value in headers.items() if name.lower() in NOT_MODIFIED_HEADERS}
+        return Response(status_code=304, headers={**not_modified, "X-Cache": cache_status})
+    return Response(content=content, status_code=entry.status_code, headers={**headers, "X-Cache": cache_status})
+
+async def proxy_buffered_request(request: Request, upstream: str, target_url: str, headers=None):
     method = request.method
-    print(target_url)
     content = await request.body()
 
-    headers = headers or dict(request.headers)
+    headers = filter_hop_by_hop(headers or request.headers)
+
+    try:
+        response = await upstream_clients.request(upstream, method, target_url, headers=headers, content=content)
+        return with_headers(
+            Response(content=response.content, status_code=response.status_code),
+            filter_hop_by_hop(response.headers, decoded=True),
+        )
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=500, detail=f"Gateway error: {str(exc)}")
+
+async def proxy_streaming_request(request: Request, upstream: str, target_url: str, headers=None):
+    method = request.method
+
+    headers = filter_hop_by_hop(headers or request.headers)
+
+    # Bodyless methods are sent without a body instead of an empty chunked stream
+    content = request.stream() if method in ("POST", "PUT", "PATCH") else None
+
+    try:
+        response = await upstream_clients.open_stream(upstream, method, target_url, headers=headers, content=content)
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=500, detail=f"Gateway error: {str(exc)}")
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
+    return relay_response(upstream, response)
+
+def relay_response(upstream: str, response: httpx.Response) -> StreamingResponse:
+    closed = False
+
+    async def close():
+        nonlocal closed
+        if not closed:
+            closed = True
+            await upstream_clients.close_stream(upstream, response)
+
+    async def body():
+        # Closed as soon as the body ends or fails: Starlette skips background tasks when the body
+        # raises mid-stream, e.g. on an upstream reset. The background task covers an unstarted body.
         try:
-            
-            response = await client.request(method, target_url, headers=headers, content=content)
-            return Response(content=response.content, status_code=response.status_code, headers=response.headers)
-        except httpx.HTTPError as exc:
-            raise HTTPException(status_code=500, detail=f"Gateway error: {str(exc)}")
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await close()
+
+    # Raw bytes are relayed untouched, so Content-Encoding/Content-Length stay valid
+    return with_headers(
+        StreamingResponse(body(), status_code=response.status_code, background=BackgroundTask(close)),
+        filter_hop_by_hop(response.headers),
+    )
+
+# API DOCS HELPERS
+def api_doc_response(request: Request, document_format: str):
+    document, encoding = api_docs.select(document_format, request.headers.get("accept-encoding"))
+    max_age = min(DOCS_CACHE_MAX_AGE, int(DOCS_REFRESH_INTERVAL)) if DOCS_MERGE_BACKENDS else DOCS_CACHE_MAX_AGE
+    headers = {
+        "ETag": document.etag_for(encoding),
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=document.variants[encoding], media_type=document.media_type, headers=headers)
+
+async def fetch_backend_specs() -> dict:
+    # A backend that cannot be reached keeps its last known spec
+    specs = dict(api_docs.backend_specs)
+    for prefix, upstream in DOCS_BACKENDS.items():
+        try:
+            response = await upstream_clients.request(upstream, "GET", f"{upstream_clients.upstreams[upstream]}/openapi.json")
+            response.raise_for_status()
+            specs[prefix] = response.json()
+        except (httpx.HTTPError, ValueError) as exc:
+            print(f"Failed to fetch the {upstream} OpenAPI spec: {exc}")
+    return specs
+
+async def refresh_backend_docs():
+    while True:
+        # Any failure keeps the last published document and is retried on the next round
+        try:
+            specs = await fetch_backend_specs()
+            # Re-rendering and compressing the merged document stays off the event loop
+            await asyncio.to_thread(api_docs.update_backends, specs)
+        except Exception as exc:
+            print(f"Failed to refresh the merged API docs: {exc!r}")
+        await asyncio.sleep(DOCS_REFRESH_INTERVAL)
 
 # GATEWAY APP
 app = FastAPI(title="UnivExplorer API", openapi_url = None)
+internal_app = FastAPI(title="UnivExplorer gateway internals", openapi_url=None, docs_url=None, redoc_url=None)
 
 # CORS
 app.add_middleware(
@@ -58,41 +289,80 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Cache", "ETag", "X-Request-ID", "Retry-After"],
 )
 
+# COMPRESSION
+# Cached responses and the API docs arrive precompressed and pass through
+app.add_middleware(CompressionMiddleware)
+
+# METRICS
+app.add_middleware(MetricsMiddleware)
+
+# STARTUP / SHUTDOWN EVENTS
+@app.on_event("startup")
+async def startup_event():
+    global docs_refresh_task, internal_server, internal_server_task
+    await upstream_clients.start()
+    if DOCS_MERGE_BACKENDS:
+        docs_refresh_task = asyncio.create_task(refresh_backend_docs())
+    if GATEWAY_INTERNAL_PORT:
+        # Same process, so it reports this gateway's own registry and caches
+        internal_server = uvicorn.Server(uvicorn.Config(internal_app, host=GATEWAY_INTERNAL_HOST, port=GATEWAY_INTERNAL_PORT, lifespan="off", log_config=None))
+        internal_server_task = asyncio.create_task(internal_server.serve())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if docs_refresh_task is not None:
+        docs_refresh_task.cancel()
+    if internal_server_task is not None:
+        internal_server.should_exit = True
+        await internal_server_task
+    await upstream_clients.close()
+
+# INTERNAL ROUTES
+# Upstream addresses, pool usage and cache internals, never served on the public listener
+@internal_app.get("/gateway/stats", include_in_schema=False)
+async def gateway_stats():
+    return {"upstreams": upstream_clients.stats(), "jwt_cache": token_cache.stats(), "response_cache": response_cache.stats(), "api_docs": api_docs.stats()}
+
+@internal_app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 # PROXY ROUTES
 @app.api_route("/collection/{path:path}", methods=["GET", "POST", "PUT", "DELETE"], include_in_schema=False)
 async def collection_service_proxy(path: str, request: Request, token_verified: str = Depends(verify_jwt)):
-    target_url = f"{COLLECTION_SERVICE_URL}/{path}".lstrip("/")
-    return await proxy_request(request, target_url)
+    target_url = upstream_url(COLLECTION_SERVICE_URL, public_path("collection", path), request)
+    return await cached_proxy_request(request, "collection", target_url, token_verified)
 
 @app.api_route("/auth/{path:path}", methods=["GET", "POST", "PUT", "DELETE"], include_in_schema=False)
 async def auth_service_proxy(path: str, request: Request):
-    target_url = f"{AUTH_SERVICE_URL}/{path}".lstrip("/")
-    return await proxy_request(request, target_url)
+    target_url = upstream_url(AUTH_SERVICE_URL, path, request)
+    return await proxy_request(request, "auth", target_url)
 
 @app.api_route("/exploration/{path:path}", methods=["GET", "POST", "PUT", "DELETE"], include_in_schema=False)
 async def exploration_service_proxy(path: str, request: Request, token_verified: str = Depends(verify_jwt)):
-    target_url = f"{EXPLORATION_SERVICE_URL}/{path}".lstrip("/")
+    target_url = upstream_url(EXPLORATION_SERVICE_URL, public_path("exploration", path), request)
 
-    # Custom header for username
-    headers = dict(request.headers)
-    headers["X-Username"] = token_verified
+    # Custom header for username, only ever the verified one: clients must not pick whose queue they use
+    headers = [(name, value) for name, value in request.headers.items() if name.lower() != "x-username"]
+    headers.append(("X-Username", token_verified))
 
-    return await proxy_request(request, target_url, headers=headers)
+    return await cached_proxy_request(request, "exploration", target_url, token_verified, headers=headers)
 
 # SWAGGER CUSTOM DOCS
-with open("api-doc.yaml", "r") as file:
-    openapi_spec = yaml.safe_load(file)
-
 @app.get("/api-doc.yaml", include_in_schema=False)
-async def get_openapi_yaml():
-    return Response(content=yaml.dump(openapi_spec), media_type="application/yaml")
+async def get_openapi_yaml(request: Request):
+    return api_doc_response(request, "yaml")
+
+@app.get("/api-doc.json", include_in_schema=False)
+async def get_openapi_json(request: Request):
+    return api_doc_response(request, "json")
 
 @app.get("/docs", include_in_schema=False)
 async def custom_docs():
     return get_swagger_ui_html(openapi_url="/api-doc.yaml", title="Custom API Docs")
 
 if __name__ == "__main__":
-    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8080, reload=True)
@@ -0,0 +1,8 @@
+# Run from the service directory, like the service itself:
+#
+#   cd api-gateway && python -m pytest tests
+import os
+import sys
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
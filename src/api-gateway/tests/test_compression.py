@@ -0,0 +1,76 @@
+import asyncio
+import gzip
+
+import brotli
+import pytest
+
+from utils import compression
+from utils.compression import CompressionMiddleware
+
+BODY = b'{"name": "Benchmarkia", "main_event": "ancient storm signal"}\n' * 2000
+DECOMPRESS = {"gzip": gzip.decompress, "br": brotli.decompress}
+
+
+def run(chunks: list, encoding: str, content_length: int = len(BODY)) -> list:
+    async def app(scope, receive, send):
+        headers = [(b"content-type", b"application/json"), (b"etag", b'"abc"')]
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", encoding.encode())]}
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(CompressionMiddleware(app)(scope, None, send))
+    return messages
+
+
+def headers_of(message) -> dict:
+    return {name.decode(): value.decode() for name, value in message["headers"]}
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_single_message_keeps_content_length(encoding):
+    start, body = run([BODY], encoding)
+    headers = headers_of(start)
+    assert headers["content-encoding"] == encoding
+    assert headers["etag"] == f'"abc-{encoding}"'
+    assert int(headers["content-length"]) == len(body["body"])
+    assert DECOMPRESS[encoding](body["body"]) == BODY
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_relayed_body_is_compressed_as_it_arrives(encoding):
+    size = 16 * 1024
+    chunks = [BODY[offset:offset + size] for offset in range(0, len(BODY), size)]
+    messages = run(chunks, encoding)
+    headers = headers_of(messages[0])
+    assert headers["content-encoding"] == encoding
+    assert "content-length" not in headers
+    bodies = [message for message in messages[1:]]
+    # Compressed output goes out before the upstream body is complete
+    assert len(bodies) > 1 and all(message["more_body"] for message in bodies[:-1])
+    assert not bodies[-1]["more_body"]
+    assert DECOMPRESS[encoding](b"".join(message["body"] for message in bodies)) == BODY
+
+
+def test_streams_without_length_pass_through():
+    messages = run([BODY[:100], BODY[100:]], "gzip", content_length=None)
+    assert "content-encoding" not in headers_of(messages[0])
+    assert b"".join(message["body"] for message in messages[1:]) == BODY
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+@pytest.mark.parametrize("chunk_size", [None, 64 * 1024])
+def test_bodies_over_the_whole_body_limit_are_compressed(encoding, chunk_size):
+    body = BODY * 20
+    assert len(body) > compression.COMPRESS_MAX_BYTES
+    chunks = [body] if chunk_size is None else [body[offset:offset + chunk_size] for offset in range(0, len(body), chunk_size)]
+    messages = run(chunks, encoding, content_length=len(body))
+    assert headers_of(messages[0])["content-encoding"] == encoding
+    assert DECOMPRESS[encoding](b"".join(message["body"] for message in messages[1:])) == body
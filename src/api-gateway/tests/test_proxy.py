@@ -0,0 +1,229 @@
+import asyncio
+import importlib
+import os
+import urllib.parse
+
+import httpx
+import pytest
+from starlette.requests import Request
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def gateway():
+    # main.py reads api-doc.yaml relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(SERVICE_DIR)
+    try:
+        main = importlib.import_module("main")
+    finally:
+        os.chdir(cwd)
+    main.app.dependency_overrides[main.verify_jwt] = lambda: "tester"
+    yield main
+    main.app.dependency_overrides.clear()
+
+
+def status_for(app, path: str) -> int:
+    # A raw ASGI request, since HTTP clients resolve dot segments before sending them
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        # Servers hand over the decoded path, the raw one keeps its percent-escapes
+        "path": urllib.parse.unquote(path),
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"gateway"), (b"authorization", b"Bearer test")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("gateway", 8080),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages[0]["status"]
+
+
+@pytest.mark.parametrize("path", [
+    "/exploration/admin",
+    "/exploration/admin/admission",
+    "/exploration//admin/admission",
+    "/exploration/admin/",
+    "/exploration/metrics",
+    "/exploration/ready",
+    "/collection/metrics",
+    "/collection/catalog/stats",
+    "/collection//catalog/stats/",
+])
+def test_internal_paths_are_not_proxied(gateway, path):
+    assert status_for(gateway.app, path) == 404
+
+
+@pytest.mark.parametrize("path", ["/metrics", "/gateway/stats"])
+def test_internals_are_only_on_the_internal_app(gateway, path):
+    assert status_for(gateway.app, path) == 404
+    assert status_for(gateway.internal_app, path) == 200
+
+
+@pytest.mark.parametrize("path", ["/collection/metrics", "/exploration/metrics"])
+def test_metrics_are_never_cached(gateway, path):
+    assert gateway.response_cache.rule_for(path) is None
+
+
+@pytest.mark.parametrize("path", [
+    "/exploration/x/../admin/admission",
+    "/exploration/./admin/admission",
+    "/exploration/admin/../admin/db-stats",
+    "/exploration/planets/..",
+])
+def test_dot_segments_are_rejected(gateway, path):
+    assert status_for(gateway.app, path) == 400
+
+
+@pytest.mark.parametrize("path", [
+    f"/{upstream}{prefix}{suffix}"
+    for upstream, prefixes in [("collection", ("/catalog/stats", "/metrics")), ("exploration", ("/metrics", "/ready"))]
+    for prefix in prefixes
+    for suffix in ("%3F", "%3Fa", "%23x", "%2F", "%2Fx")
+])
+def test_encoded_separators_do_not_expose_internal_paths(gateway, path):
+    assert status_for(gateway.app, path) == 404
+
+
+@pytest.mark.parametrize("path", [
+    "/exploration/admin%3F",
+    "/exploration/admin%3F/admission",
+    "/exploration/admin%3Fx=1",
+    "/exploration/admin%23",
+    "/exploration/admin%23/db-stats",
+    "/exploration/admin%2Fadmission",
+])
+def test_encoded_separators_do_not_expose_admin(gateway, path):
+    assert status_for(gateway.app, path) == 404
+
+
+def request_for(path: str, query_string: bytes = b"") -> Request:
+    return Request({"type": "http", "method": "GET", "path": urllib.parse.unquote(path), "raw_path": path.encode(), "query_string": query_string, "headers": [(b"host", b"gateway")]})
+
+
+@pytest.mark.parametrize("path, quoted", [
+    ("planets/user/a#b", "planets/user/a%23b"),
+    ("planets/user/ann smith", "planets/user/ann%20smith"),
+])
+def test_forwarded_paths_are_quoted(gateway, path, quoted):
+    url = gateway.upstream_url("http://exploration", gateway.public_path("exploration", path), request_for(f"/exploration/{path}"))
+    assert url == f"http://exploration/{quoted}"
+
+
+@pytest.mark.parametrize("path, query_string, expected", [
+    ("planets/all", b"limit=10&after=abc&view=summary&format=ndjson", "planets/all?limit=10&after=abc&view=summary&format=ndjson"),
+    ("planets/a?b", b"", "planets/a%3Fb"),
+    ("planets/a?b", b"limit=5", "planets/a%3Fb?limit=5"),
+    ("planets/all", b"name=a%26b", "planets/all?name=a%26b"),
+])
+def test_query_strings_are_forwarded_as_sent(gateway, path, query_string, expected):
+    url = gateway.upstream_url("http://exploration", path, request_for(f"/exploration/{urllib.parse.quote(path)}", query_string))
+    assert url == f"http://exploration/{expected}"
+
+
+@pytest.mark.parametrize("path", ["planets/all", "planets/user/ann", "administrators", "latest/"])
+def test_public_paths_pass_through(gateway, path):
+    assert gateway.public_path("exploration", path) == path
+
+
+def test_repeated_response_headers_are_relayed(gateway):
+    upstream = httpx.Response(200, headers=[("Set-Cookie", "a=1"), ("Set-Cookie", "b=2"), ("Connection", "close")])
+    relayed = gateway.relay_response("auth", upstream)
+    assert [value for name, value in relayed.raw_headers if name == b"set-cookie"] == [b"a=1", b"b=2"]
+    assert all(name != b"connection" for name, _ in relayed.raw_headers)
+
+
+def test_docs_refresh_survives_a_failed_merge(gateway, monkeypatch):
+    rounds = []
+
+    def failing_update(specs):
+        rounds.append(specs)
+        raise ValueError("unmergeable spec")
+
+    async def no_specs():
+        return {}
+
+    monkeypatch.setattr(gateway, "fetch_backend_specs", no_specs)
+    monkeypatch.setattr(gateway, "DOCS_REFRESH_INTERVAL", 0.01)
+    monkeypatch.setattr(gateway.api_docs, "update_backends", failing_update)
+
+    async def main():
+        task = asyncio.create_task(gateway.refresh_backend_docs())
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        task.cancel()
+
+    asyncio.run(main())
+    assert len(rounds) > 1
+
+
+def test_clients_cannot_choose_the_forwarded_username(gateway, monkeypatch):
+    forwarded = []
+
+    async def open_stream(name, method, url, **kwargs):
+        forwarded.append(httpx.Headers(kwargs["headers"]))
+        return httpx.Response(200, stream=httpx.ByteStream(b"{}"))
+
+    async def close_stream(name, response):
+        pass
+
+    monkeypatch.setattr(gateway.upstream_clients, "open_stream", open_stream)
+    monkeypatch.setattr(gateway.upstream_clients, "close_stream", close_stream)
+
+    async def main():
+        transport = httpx.ASGITransport(app=gateway.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+            headers = [("Authorization", "Bearer test"), ("X-Username", "spoofed"), ("x-username", "other")]
+            return await client.post("/exploration/explore", headers=headers)
+
+    assert asyncio.run(main()).status_code == 200
+    assert forwarded[0].get_list("x-username") == ["tester"]
+
+
+class ResetStream(httpx.AsyncByteStream):
+    async def __aiter__(self):
+        yield b'{"planets": ['
+        raise httpx.ReadError("connection reset by upstream")
+
+
+@pytest.mark.parametrize("stream, fails", [(ResetStream(), True), (httpx.ByteStream(b"[]"), False)])
+def test_relayed_stream_is_closed_once(gateway, monkeypatch, stream, fails):
+    closed = []
+
+    async def close_stream(name, response):
+        closed.append(name)
+
+    monkeypatch.setattr(gateway.upstream_clients, "close_stream", close_stream)
+    relayed = gateway.relay_response("exploration", httpx.Response(200, stream=stream))
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}, "method": "GET", "headers": []}
+
+    async def receive():
+        await asyncio.sleep(1)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    async def main():
+        if fails:
+            with pytest.raises(Exception):
+                await relayed(scope, receive, send)
+        else:
+            await relayed(scope, receive, send)
+
+    asyncio.run(main())
+    assert closed == ["exploration"]
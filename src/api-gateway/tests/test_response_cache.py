@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from utils import response_cache
+from utils.response_cache import RelayResponse, ResponseCache
+
+KEY = ("GET", "/collection/planets", "", "shared")
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache({"/collection/": [60, "shared"]}, max_bytes=1024 * 1024)
+
+
+def relay_outcome(cache, waiters: int, claim: bool, monkeypatch) -> dict:
+    monkeypatch.setattr(response_cache, "RELAY_CLAIM_TIMEOUT", 0.01)
+    upstream = {"closed": 0}
+
+    async def close():
+        upstream["closed"] += 1
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        raise RelayResponse("upstream response", close)
+
+    async def waiter():
+        try:
+            await cache.fetch(KEY, 60, loader)
+        except RelayResponse as relay:
+            return relay.claim() if claim else None
+
+    async def main():
+        tasks = [asyncio.ensure_future(waiter()) for _ in range(waiters)]
+        if not claim:
+            # Every client goes away before the relayed response reaches it
+            await asyncio.sleep(0)
+            for task in tasks:
+                task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.sleep(0.05)
+        return results
+
+    upstream["results"] = asyncio.run(main())
+    return upstream
+
+
+def test_unclaimed_relay_is_closed(cache, monkeypatch):
+    assert relay_outcome(cache, 3, claim=False, monkeypatch=monkeypatch)["closed"] == 1
+
+
+def test_claimed_relay_is_left_to_its_claimer(cache, monkeypatch):
+    outcome = relay_outcome(cache, 3, claim=True, monkeypatch=monkeypatch)
+    assert outcome["closed"] == 0
+    assert outcome["results"].count("upstream response") == 1
+
+
+def fetch_all(cache, loader, requests: int = 1, key: tuple = KEY, ttl: float = 60) -> list:
+    async def main():
+        return await asyncio.gather(*[cache.fetch(key, ttl, loader) for _ in range(requests)], return_exceptions=True)
+
+    return asyncio.run(main())
+
+
+def loader_for(content: bytes = b"[]", headers: dict = None, calls: list = None):
+    async def loader():
+        if calls is not None:
+            calls.append(1)
+        await asyncio.sleep(0.01)
+        return 200, {"content-type": "application/json", **(headers or {})}, content
+
+    return loader
+
+
+def test_concurrent_misses_share_one_load(cache):
+    calls = []
+    results = fetch_all(cache, loader_for(calls=calls), requests=4)
+    assert sorted(status for _, status in results) == ["HIT", "HIT", "HIT", "MISS"]
+    assert len(calls) == 1
+    entry, status = fetch_all(cache, loader_for(calls=calls))[0]
+    assert (status, entry.content, len(calls)) == ("HIT", b"[]", 1)
+
+
+def test_loader_errors_are_not_cached(cache):
+    async def failing():
+        raise ValueError("upstream down")
+
+    assert isinstance(fetch_all(cache, failing)[0], ValueError)
+    assert cache.get(KEY) is None
+
+
+def test_no_store_and_private_responses_are_not_kept(cache):
+    fetch_all(cache, loader_for(headers={"cache-control": "no-store"}))
+    fetch_all(cache, loader_for(headers={"cache-control": "private"}), key=("GET", "/collection/other", "", "shared"))
+    assert cache.entries == {}
+    assert cache.counters["uncacheable"] == 2
+
+
+def test_expired_entries_are_reloaded(cache):
+    calls = []
+    fetch_all(cache, loader_for(calls=calls), ttl=0.01)
+    asyncio.run(asyncio.sleep(0.02))
+    assert fetch_all(cache, loader_for(calls=calls))[0][1] == "MISS"
+    assert len(calls) == 2
+
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    # Each entry is about 370 bytes with its headers, so three fit
+    cache = ResponseCache({"/": [60, "shared"]}, max_bytes=1200, max_entry_bytes=1200)
+    keys = [("GET", f"/{name}", "", "shared") for name in "abc"]
+    for key in keys:
+        fetch_all(cache, loader_for(b"x" * 300), key=key)
+    cache.get(keys[0])
+    fetch_all(cache, loader_for(b"x" * 300), key=("GET", "/d", "", "shared"))
+    assert [key[1] for key in cache.entries] == ["/c", "/a", "/d"]
+    assert cache.size <= cache.max_bytes
+
+
+def test_longest_prefix_rule_wins():
+    cache = ResponseCache({"/collection/": [300, "shared"], "/collection/catalog/": [0, "shared"], "/exploration/planets/user/": [10, "user"]}, max_bytes=1024)
+    assert cache.rule_for("/collection/planets") == (300, "shared")
+    assert cache.rule_for("/collection/catalog/stats") is None
+    assert cache.rule_for("/exploration/planets/user/ann") == (10, "user")
+    assert cache.rule_for("/auth/login") is None
+
+
+def test_invalidation_drops_the_written_prefix(cache):
+    fetch_all(cache, loader_for())
+    fetch_all(cache, loader_for(), key=("GET", "/exploration/latest", "", "shared"))
+    cache.invalidate("/collection/")
+    assert [key[1] for key in cache.entries] == ["/exploration/latest"]
+
+
+def test_precompressed_variants_have_their_own_validators(cache):
+    entry, _ = fetch_all(cache, loader_for(b'{"planets": "' + b"Zeta " * 500 + b'"}'))[0]
+    identity, identity_headers = entry.select("identity")
+    gzipped, gzip_headers = entry.select("gzip")
+    assert gzip_headers["content-encoding"] == "gzip" and len(gzipped) < len(identity)
+    assert gzip_headers["etag"] != identity_headers["etag"]
+    assert gzip_headers["vary"] == identity_headers["vary"] == "Accept-Encoding"
+    assert cache.not_modified(entry, f'W/{gzip_headers["etag"]}', gzip_headers["etag"])
+    assert not cache.not_modified(entry, identity_headers["etag"], gzip_headers["etag"])
+
+
+def test_large_entries_are_precompressed():
+    cache = ResponseCache({"/collection/": [60, "shared"]}, max_bytes=64 * 1024 * 1024, max_entry_bytes=8 * 1024 * 1024)
+    content = b'{"planets": "' + b"Zeta " * (300 * 1024) + b'"}'
+    entry, _ = fetch_all(cache, loader_for(content))[0]
+    assert len(content) > 1024 * 1024
+    gzipped, headers = entry.select("gzip")
+    assert headers["content-encoding"] == "gzip" and len(gzipped) < len(content)
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        return await asyncio.gather(*[flight.do("key", call) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "calls": 5, "executions": 1, "coalesced": 4}
+
+
+def test_errors_reach_every_caller_and_are_not_remembered():
+    flight = SingleFlight()
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def main():
+        results = await asyncio.gather(*[flight.do("key", failing) for _ in range(3)], return_exceptions=True)
+        assert not flight.pending("key")
+        # The next call runs again instead of replaying the error
+        with pytest.raises(ValueError):
+            await flight.do("key", failing)
+        return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(attempts) == 2
+
+
+def test_a_caller_going_away_does_not_cancel_the_call():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.02)
+        return "value"
+
+    async def main():
+        leaving = asyncio.ensure_future(flight.do("key", call))
+        staying = asyncio.ensure_future(flight.do("key", call))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        return await staying, leaving.cancelled()
+
+    assert asyncio.run(main()) == ("value", True)
+
+
+def test_different_keys_run_independently():
+    flight = SingleFlight()
+
+    async def call(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        return await asyncio.gather(flight.do("a", lambda: call("a")), flight.do("b", lambda: call("b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+    assert flight.counters["executions"] == 2
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from utils.token_cache import TokenVerificationCache
+
+SECRET = "test-secret"
+
+
+def token_for(username: str = "ann", exp: float = None, secret: str = SECRET, **claims) -> str:
+    if username is not None:
+        claims["username"] = username
+    if exp is not None:
+        claims["exp"] = int(exp)
+    return "Bearer " + jwt.encode(claims, secret, algorithm="HS256")
+
+
+def verify_all(cache, tokens: list, remote_verify=None) -> list:
+    async def main():
+        return await asyncio.gather(*[cache.verify(token, remote_verify) for token in tokens], return_exceptions=True)
+
+    return asyncio.run(main())
+
+
+def remote(calls: list, latency: float = 0.01, username: str = "ann"):
+    async def verify(token):
+        calls.append(token)
+        await asyncio.sleep(latency)
+        return username
+
+    return verify
+
+
+def test_least_recently_used_tokens_are_evicted():
+    cache = TokenVerificationCache(max_entries=2)
+    keys = ["a", "b", "c"]
+    cache.put(keys[0], "ann")
+    cache.put(keys[1], "bob")
+    assert cache.get(keys[0]) == "ann"
+    cache.put(keys[2], "cid")
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.counters["evictions"] == 1
+
+
+def test_entries_expire_at_the_earlier_of_exp_and_max_ttl():
+    cache = TokenVerificationCache(max_ttl=60)
+    now = time.time()
+    cache.put("far", "ann", exp=now + 3600)
+    cache.put("near", "bob", exp=now + 10)
+    assert cache.entries["far"][1] == pytest.approx(now + 60, abs=1)
+    assert cache.entries["near"][1] == pytest.approx(now + 10, abs=1)
+
+
+def test_already_expired_tokens_are_not_cached():
+    cache = TokenVerificationCache()
+    cache.put("old", "ann", exp=time.time() - 1)
+    assert cache.entries == {}
+
+
+def test_expired_entries_are_dropped_on_lookup():
+    cache = TokenVerificationCache()
+    cache.entries["key"] = ("ann", time.time() - 1)
+    assert cache.get("key") is None
+    assert cache.entries == {} and cache.counters["expired"] == 1
+
+
+def test_concurrent_remote_verifications_share_one_call():
+    cache = TokenVerificationCache()
+    calls = []
+    token = token_for(exp=time.time() + 3600)
+    assert verify_all(cache, [token] * 5, remote(calls)) == ["ann"] * 5
+    assert len(calls) == 1
+    assert verify_all(cache, [token], remote(calls)) == ["ann"]
+    assert len(calls) == 1 and cache.counters["hits"] == 1
+
+
+def test_rejected_remote_verifications_are_not_cached():
+    cache = TokenVerificationCache()
+    calls = []
+
+    async def reject(token):
+        calls.append(token)
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    token = token_for()
+    for _ in range(2):
+        result = verify_all(cache, [token], reject)[0]
+        assert isinstance(result, HTTPException) and result.status_code == 401
+    assert len(calls) == 2 and cache.entries == {}
+
+
+def test_local_verification_caches_until_exp():
+    cache = TokenVerificationCache(secret=SECRET)
+    token = token_for(exp=time.time() + 30)
+    assert verify_all(cache, [token, token]) == ["ann", "ann"]
+    assert cache.counters["local"] == 1
+    assert next(iter(cache.entries.values()))[1] == pytest.approx(time.time() + 30, abs=1)
+
+
+@pytest.mark.parametrize("token, detail", [
+    (token_for(exp=time.time() - 10), "Invalid token"),
+    (token_for(secret="other-secret-other-secret"), "Invalid token"),
+    (token_for().removeprefix("Bearer "), "Invalid token"),
+    ("Bearer not-a-jwt", "Invalid token"),
+    (token_for(username=None, role="admin"), "Invalid user info"),
+])
+def test_local_verification_rejects_bad_tokens(token, detail):
+    cache = TokenVerificationCache(secret=SECRET)
+    result = verify_all(cache, [token])[0]
+    assert isinstance(result, HTTPException) and (result.status_code, result.detail) == (401, detail)
+    assert cache.entries == {}
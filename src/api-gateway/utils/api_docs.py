@@ -0,0 +1,110 @@
+import copy
+import gzip
+import hashlib
+import json
+
+import yaml
+
+from utils.compression import negotiate_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MEDIA_TYPES = {
+    "yaml": "application/yaml",
+    "json": "application/json",
+}
+
+
+def namespace_refs(node, names: dict):
+    # Rewrites "#/components/schemas/<name>" references after schemas were renamed on merge
+    if isinstance(node, dict):
+        return {
+            key: "#/components/schemas/" + names.get(value.rsplit("/", 1)[-1], value.rsplit("/", 1)[-1])
+            if key == "$ref" and isinstance(value, str) and value.startswith("#/components/schemas/")
+            else namespace_refs(value, names)
+            for key, value in node.items()
+        }
+    if isinstance(node, list):
+        return [namespace_refs(item, names) for item in node]
+    return node
+
+
+def merge_specs(base: dict, backends: dict) -> dict:
+    # `backends` maps a gateway route prefix (e.g. "/collection") to that service's own spec.
+    # Paths documented by hand in the base spec win, backend schemas are namespaced per service.
+    merged = copy.deepcopy(base)
+    paths = merged.setdefault("paths", {})
+    schemas = merged.setdefault("components", {}).setdefault("schemas", {})
+
+    for prefix, spec in backends.items():
+        service = prefix.strip("/")
+        names = {name: f"{service.capitalize()}{name}" for name in spec.get("components", {}).get("schemas", {})}
+        spec = namespace_refs(spec, names)
+
+        for name, schema in spec.get("components", {}).get("schemas", {}).items():
+            schemas.setdefault(names[name], schema)
+        for path, operations in spec.get("paths", {}).items():
+            gateway_path = prefix + path
+            if gateway_path in paths:
+                continue
+            for operation in operations.values():
+                if isinstance(operation, dict):
+                    operation.setdefault("tags", [service])
+            paths[gateway_path] = operations
+    return merged
+
+
+class RenderedDocument:
+    # One serialization of the spec with its precompressed variants and their strong ETags
+    def __init__(self, content: bytes, media_type: str):
+        self.media_type = media_type
+        self.etag = hashlib.sha256(content).hexdigest()[:32]
+        self.variants = {"identity": content, "gzip": gzip.compress(content, compresslevel=9)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(content, quality=11)
+
+    def etag_for(self, encoding: str) -> str:
+        return f'"{self.etag}"' if encoding == "identity" else f'"{self.etag}-{encoding}"'
+
+    def stats(self) -> dict:
+        return {"etag": self.etag, **{encoding: len(content) for encoding, content in self.variants.items()}}
+
+
+class ApiDocs:
+    # The gateway's OpenAPI document, rendered once per change instead of once per request
+    def __init__(self, spec: dict):
+        self.base_spec = spec
+        self.backend_specs = {}
+        self.documents = {}
+        self.refreshes = 0
+        self.render()
+
+    def render(self):
+        spec = merge_specs(self.base_spec, self.backend_specs) if self.backend_specs else self.base_spec
+        self.documents = {
+            "yaml": RenderedDocument(yaml.dump(spec).encode(), MEDIA_TYPES["yaml"]),
+            "json": RenderedDocument(json.dumps(spec, default=str).encode(), MEDIA_TYPES["json"]),
+        }
+
+    def update_backends(self, backend_specs: dict):
+        if backend_specs == self.backend_specs:
+            return
+        self.backend_specs = backend_specs
+        self.refreshes += 1
+        self.render()
+
+    def select(self, document_format: str, accept_encoding: str):
+        document = self.documents[document_format]
+        encoding = negotiate_encoding(accept_encoding, document.variants)
+        return document, encoding
+
+    def stats(self) -> dict:
+        return {
+            "merged_backends": sorted(self.backend_specs),
+            "refreshes": self.refreshes,
+            "brotli": brotli is not None,
+            "documents": {name: document.stats() for name, document in self.documents.items()},
+        }
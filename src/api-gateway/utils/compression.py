@@ -0,0 +1,155 @@
+from starlette.datastructures import Headers, MutableHeaders
+
+import asyncio
+import gzip
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies below this size are not worth the CPU and the extra headers. Whole bodies above the maximum
+# are compressed in a worker thread rather than keeping the event loop busy; streamed bodies are
+# compressed chunk by chunk whatever their size, and cache entries are precompressed off the loop.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_MAX_BYTES = int(os.getenv("COMPRESS_MAX_BYTES", str(1024 * 1024)))
+
+# Per-response compression trades ratio for speed, unlike the API docs which are compressed once
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+COMPRESSIBLE_TYPES = {"application/json", "application/x-ndjson", "application/yaml", "application/javascript"}
+
+
+def negotiate_encoding(accept_encoding: str, available) -> str:
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+def compressible(status_code: int, headers, size: int) -> bool:
+    # Successful, not yet encoded text payloads; event streams are never buffered for compression
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    if status_code < 200 or status_code in (204, 206, 304) or size < COMPRESS_MIN_BYTES:
+        return False
+    if headers.get("content-encoding", "identity").lower() != "identity":
+        return False
+    if content_type == "text/event-stream":
+        return False
+    return content_type in COMPRESSIBLE_TYPES or content_type.startswith("text/") or content_type.endswith("+json")
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=GZIP_LEVEL)
+
+
+class StreamCompressor:
+    # Incremental counterpart of compress(): only the compressor's own window is held in memory
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            # Brotli holds input up to its window (4 MB) before emitting, so every chunk is flushed
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress = lambda data: compressor.process(data) + compressor.flush()
+            self.finish = compressor.finish
+        else:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress, self.finish = compressor.compress, compressor.flush
+
+
+def variant_etag(etag: str, encoding: str) -> str:
+    # A compressed body is a different representation, so it gets its own strong validator
+    return etag if encoding == "identity" or not etag.endswith('"') else f'{etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison, as If-None-Match calls for
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class CompressionMiddleware:
+    # ASGI middleware: gzip/brotli negotiated from Accept-Encoding for responses of a declared
+    # Content-Length. A body sent in one message is compressed whole and keeps a Content-Length,
+    # relayed upstream bodies are compressed chunk by chunk as they arrive, never buffered.
+    # Chunked streams (SSE, NDJSON), small bodies and responses that already carry a
+    # Content-Encoding (e.g. precompressed cache entries) are passed through untouched.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"), ENCODINGS)
+        # HEAD responses declare the length of a body they do not carry
+        if encoding == "identity" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                size = headers.get("content-length")
+                if size is not None and size.isdigit() and compressible(message["status"], headers, int(size)):
+                    # Held until the first body message shows whether the body is already complete
+                    start_message = message
+                    return
+            elif message["type"] == "http.response.body" and start_message is not None:
+                body = message.get("body", b"")
+                more_body = message.get("more_body", False)
+                if compressor is None:
+                    if not more_body:
+                        if len(body) > COMPRESS_MAX_BYTES:
+                            compressed = await asyncio.to_thread(compress, body, encoding)
+                        else:
+                            compressed = compress(body, encoding)
+                        await send_start(start_message, compressed)
+                        return
+                    compressor = StreamCompressor(encoding)
+                    await send_start(start_message)
+                chunk = compressor.compress(body) + (b"" if more_body else compressor.finish())
+                if chunk or not more_body:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+            await send(message)
+
+        async def send_start(message, body: bytes = None):
+            # Without a complete body the length is unknown and the response goes out chunked
+            headers = MutableHeaders(scope=message)
+            headers["content-encoding"] = encoding
+            if body is None:
+                del headers["content-length"]
+            else:
+                headers["content-length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                headers["etag"] = variant_etag(headers["etag"], encoding)
+            await send(message)
+            if body is not None:
+                await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
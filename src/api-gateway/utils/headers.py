@@ -0,0 +1,47 @@
+# RFC 7230, section 6.1: connection-level headers that must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+}
+
+# Set by the HTTP client from the target URL / body
+REQUEST_MANAGED_HEADERS = {"host"}
+
+# Only valid for the raw upstream body, not for an already decoded one
+DECODED_BODY_HEADERS = {"content-encoding", "content-length"}
+
+
+def header_items(headers) -> list:
+    # Every (name, value) pair, repeated headers such as Set-Cookie included.
+    # httpx.Headers.items() would join repeated values with commas, multi_items() keeps them apart.
+    if hasattr(headers, "multi_items"):
+        return headers.multi_items()
+    return list(headers.items() if hasattr(headers, "items") else headers)
+
+
+def filter_hop_by_hop(headers, decoded: bool = False) -> list:
+    items = header_items(headers)
+
+    # Headers listed in Connection are hop-by-hop too
+    dropped = set(HOP_BY_HOP_HEADERS) | REQUEST_MANAGED_HEADERS
+    for key, value in items:
+        if key.lower() == "connection":
+            dropped.update(token.strip().lower() for token in value.split(",") if token.strip())
+    if decoded:
+        dropped |= DECODED_BODY_HEADERS
+
+    return [(key, value) for key, value in items if key.lower() not in dropped]
+
+
+def with_headers(response, headers: list):
+    # Starlette responses take a mapping, which has room for only one value per header name
+    response.raw_headers.extend((key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in headers)
+    return response
@@ -0,0 +1,273 @@
+from contextlib import contextmanager
+
+import contextvars
+import functools
+import os
+import re
+import threading
+import time
+import uuid
+
+# Shared by api-gateway, celestial-collection and exploration-service (each keeps an identical copy).
+# Metrics are exposed in the Prometheus text format, without a client library dependency.
+
+# GLOBAL
+REQUEST_ID_HEADER = "X-Request-ID"
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1.0"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Probes do not count as the first served request
+PROBE_PATHS = {"/ready", "/metrics"}
+
+# Ids accepted from a client or an upstream hop, anything else gets a fresh one
+VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# Per-request context: the request id and the time spent in each upstream target
+request_id = contextvars.ContextVar("request_id", default=None)
+upstream_timings = contextvars.ContextVar("upstream_timings", default=None)
+
+
+def process_started_at() -> float:
+    # Wall-clock start of this process (not of this module's import), from /proc where available
+    try:
+        with open("/proc/self/stat") as file:
+            start_ticks = float(file.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as file:
+            uptime = float(file.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+PROCESS_STARTED_AT = process_started_at()
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.values = {}
+        # Some observations come from worker threads, e.g. the MongoDB driver's
+        self.lock = threading.Lock()
+
+    def key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")).replace('"', "'") for name in self.labels)
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{labels} {format_value(value)}" for name, labels, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self):
+        for key, value in sorted(self.values.items()):
+            yield self.name, format_labels(self.labels, key), value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, labels=()):
+        super().__init__(name, description, labels)
+        self.callbacks = {}
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def track(self, callback, **labels):
+        # Value read from `callback` at scrape time, e.g. a hit ratio from an existing stats() dict
+        self.callbacks[self.key(labels)] = callback
+
+    def samples(self):
+        values = dict(self.values)
+        for key, callback in self.callbacks.items():
+            try:
+                values[key] = float(callback())
+            except Exception:
+                continue
+        for key, value in sorted(values.items()):
+            yield self.name, format_labels(self.labels, key), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def samples(self):
+        for key, (counts, total) in sorted(self.values.items()):
+            for bound, count in zip(self.buckets, counts):
+                yield f"{self.name}_bucket", format_labels(self.labels, key, f'le="{format_value(bound)}"'), count
+            yield f"{self.name}_sum", format_labels(self.labels, key), total
+            yield f"{self.name}_count", format_labels(self.labels, key), counts[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str, labels=()) -> Counter:
+        return self.register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels=()) -> Gauge:
+        return self.register(Gauge(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# METRICS
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram("http_request_duration_seconds", "Time to serve a request, until the last body byte", ["method", "route", "status"])
+REQUESTS_IN_FLIGHT = registry.gauge("http_requests_in_flight", "Requests currently being served")
+UPSTREAM_LATENCY = registry.histogram("upstream_request_duration_seconds", "Time spent waiting on an upstream call", ["target", "operation", "outcome"])
+UPSTREAMS_IN_FLIGHT = registry.gauge("upstream_requests_in_flight", "Upstream calls currently in flight", ["target"])
+CACHE_HIT_RATIO = registry.gauge("cache_hit_ratio", "Hit ratio of an in-process cache since startup", ["cache"])
+STARTUP_SECONDS = registry.gauge("startup_seconds", "Seconds from process start to a startup milestone", ["phase"])
+
+
+def mark_startup(phase: str):
+    # Only the first occurrence of a milestone is recorded
+    if STARTUP_SECONDS.key({"phase": phase}) not in STARTUP_SECONDS.values:
+        STARTUP_SECONDS.set(round(time.time() - PROCESS_STARTED_AT, 3), phase=phase)
+
+
+def current_request_id():
+    return request_id.get()
+
+
+@contextmanager
+def track_upstream(target: str, operation: str = ""):
+    UPSTREAMS_IN_FLIGHT.inc(target=target)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        elapsed = time.perf_counter() - start
+        UPSTREAMS_IN_FLIGHT.dec(target=target)
+        UPSTREAM_LATENCY.observe(elapsed, target=target, operation=operation, outcome=outcome)
+        timings = upstream_timings.get()
+        if timings is not None:
+            timings[target] = timings.get(target, 0.0) + elapsed
+
+
+def timed_upstream(target: str, operation: str = None):
+    # Decorator form of track_upstream for async functions
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with track_upstream(target, operation or function.__name__):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def track_cache(name: str, stats):
+    # `stats` returns the cache's stats() dict, which already carries a hit_ratio
+    CACHE_HIT_RATIO.track(lambda: stats()["hit_ratio"], cache=name)
+
+
+class MetricsMiddleware:
+    # ASGI middleware: assigns/propagates X-Request-ID, times every request by route template
+    # and logs a per-upstream breakdown of requests slower than SLOW_REQUEST_SECONDS.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode(), b"").decode("latin-1")
+        rid = incoming if VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        rid_token = request_id.set(rid)
+        timings_token = upstream_timings.set({})
+        status = 500
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if scope["path"] not in PROBE_PATHS:
+                    mark_startup("first_response")
+                # Replaces an id echoed by an upstream hop or replayed from a cached response
+                name = REQUEST_ID_HEADER.lower().encode()
+                headers = [(key, value) for key, value in message.get("headers", []) if key.lower() != name]
+                message["headers"] = headers + [(name, rid.encode())]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            route = getattr(route, "path", "unmatched")
+            REQUEST_LATENCY.observe(elapsed, method=scope["method"], route=route, status=status)
+            if elapsed >= SLOW_REQUEST_SECONDS:
+                breakdown = ", ".join(f"{target}={seconds:.3f}s" for target, seconds in upstream_timings.get().items())
+                print(f"[{rid}] slow request {scope['method']} {scope['path']} {status} {elapsed:.3f}s ({breakdown or 'no upstream calls'})")
+            upstream_timings.reset(timings_token)
+            request_id.reset(rid_token)
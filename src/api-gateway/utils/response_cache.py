@@ -0,0 +1,193 @@
+from collections import OrderedDict
+
+import asyncio
+import hashlib
+import time
+
+from utils.compression import ENCODINGS, compress, compressible, etag_matches, negotiate_encoding, variant_etag
+from utils.single_flight import SingleFlight
+
+# Upstream headers that are recomputed per response instead of being replayed from the cache
+UNCACHED_HEADERS = {"date", "content-length", "set-cookie", "x-request-id"}
+
+# Conditional request headers are answered by the cache, never forwarded on a fill
+CONDITIONAL_HEADERS = {"if-none-match", "if-modified-since"}
+
+# Headers a 304 repeats from the 200 it stands for (RFC 9110, section 15.4.5)
+NOT_MODIFIED_HEADERS = {"cache-control", "content-location", "etag", "expires", "vary"}
+
+# Seconds the waiters of a relayed response have to claim it before its stream is closed
+RELAY_CLAIM_TIMEOUT = 5.0
+
+
+class RelayResponse(Exception):
+    # Raised by a loader for an upstream response that is streamed or too large to cache. Its body
+    # is relayed, not buffered; only one of the coalesced waiters can claim it, the others refetch.
+    # `close` releases the response, the cache calls it when nobody claims it in time.
+    def __init__(self, response, close):
+        super().__init__("response is relayed, not cached")
+        self.response = response
+        self.close = close
+        self.claimed = False
+        self.expiry = None
+        self.closing = None
+
+    def claim(self):
+        if self.claimed:
+            return None
+        self.claimed = True
+        if self.expiry is not None:
+            self.expiry.cancel()
+        return self.response
+
+    def expire_after(self, timeout: float):
+        # Every waiter may be gone (e.g. client disconnects), then the stream would stay open
+        self.expiry = asyncio.get_running_loop().call_later(timeout, self.expire)
+
+    def expire(self):
+        if self.claim() is not None:
+            self.closing = asyncio.ensure_future(self.close())
+
+
+class CachedResponse:
+    def __init__(self, status_code: int, headers: dict, content: bytes, expires_at: float):
+        self.status_code = status_code
+        self.content = content
+        self.expires_at = expires_at
+        self.headers = {name: value for name, value in headers.items() if name.lower() not in UNCACHED_HEADERS}
+        self.etag = self.headers.get("etag") or '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+        self.headers["etag"] = self.etag
+        # Compressed once per fill, so hits only pick the variant the client accepts
+        self.variants = {encoding: compress(content, encoding) for encoding in ENCODINGS} if compressible(status_code, self.headers, len(content)) else {}
+
+    @property
+    def size(self) -> int:
+        variants = sum(len(content) for content in self.variants.values())
+        return len(self.content) + variants + sum(len(name) + len(value) for name, value in self.headers.items())
+
+    def select(self, accept_encoding: str):
+        # Returns (body, headers) of the representation negotiated from Accept-Encoding
+        encoding = negotiate_encoding(accept_encoding, self.variants)
+        headers = dict(self.headers)
+        if self.variants:
+            headers["vary"] = ", ".join(filter(None, [headers.get("vary"), "Accept-Encoding"]))
+        if encoding == "identity":
+            return self.content, headers
+        headers["content-encoding"] = encoding
+        headers["etag"] = variant_etag(self.etag, encoding)
+        return self.variants[encoding], headers
+
+
+class ResponseCache:
+    # Byte-bounded LRU of upstream GET responses. `rules` maps gateway path prefixes to
+    # (ttl seconds, scope); the longest matching prefix wins and a ttl of 0 disables caching.
+    # "shared" entries are served to every authenticated user, "user" entries only to their owner.
+    def __init__(self, rules: dict, max_bytes: int, max_entry_bytes: int = None):
+        self.rules = sorted(rules.items(), key=lambda rule: len(rule[0]), reverse=True)
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 16
+        self.entries = OrderedDict()
+        self.size = 0
+        self.flight = SingleFlight()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "not_modified": 0, "uncacheable": 0, "evictions": 0, "invalidations": 0}
+
+    def rule_for(self, path: str):
+        for prefix, (ttl, scope) in self.rules:
+            if path.startswith(prefix):
+                return (ttl, scope) if ttl > 0 else None
+        return None
+
+    @staticmethod
+    def cache_key(method: str, path: str, query: str, scope: str) -> tuple:
+        return method, path, query, scope
+
+    def get(self, key: tuple):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.time():
+            self.discard(key)
+            self.counters["expired"] += 1
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, entry: CachedResponse):
+        if entry.size > self.max_entry_bytes:
+            self.counters["uncacheable"] += 1
+            return
+        self.discard(key)
+        self.entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+            self.counters["evictions"] += 1
+
+    def discard(self, key: tuple):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def invalidate(self, prefix: str):
+        # Writes through the gateway drop every cached response under the written prefix
+        for key in [key for key in self.entries if key[1].startswith(prefix)]:
+            self.discard(key)
+            self.counters["invalidations"] += 1
+
+    def not_modified(self, entry: CachedResponse, if_none_match: str, etag: str = None) -> bool:
+        # `etag` is the validator of the representation being served, the entry's own by default
+        if entry.status_code == 200 and etag_matches(if_none_match, etag or entry.etag):
+            self.counters["not_modified"] += 1
+            return True
+        return False
+
+    @staticmethod
+    def cacheable(status_code: int, headers: dict, scope: str) -> bool:
+        if status_code != 200:
+            return False
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-store" in cache_control:
+            return False
+        return scope != "shared" or "private" not in cache_control
+
+    async def fetch(self, key: tuple, ttl: float, loader):
+        # Returns (entry, cache status). Concurrent misses for the same key share one upstream call.
+        entry = self.get(key)
+        if entry is not None:
+            self.counters["hits"] += 1
+            return entry, "HIT"
+
+        coalesced = self.flight.pending(key)
+        if not coalesced:
+            self.counters["misses"] += 1
+
+        async def load_and_store():
+            try:
+                status_code, headers, content = await loader()
+            except RelayResponse as relay:
+                self.counters["uncacheable"] += 1
+                relay.expire_after(RELAY_CLAIM_TIMEOUT)
+                raise
+            # Hashing and compressing a body of up to max_entry_bytes stays off the event loop
+            entry = await asyncio.to_thread(CachedResponse, status_code, headers, content, time.time() + ttl)
+            if self.cacheable(status_code, headers, key[3]):
+                self.put(key, entry)
+            else:
+                self.counters["uncacheable"] += 1
+            return entry
+
+        entry = await self.flight.do(key, load_and_store)
+        return entry, "HIT" if coalesced else "MISS"
+
+    def stats(self) -> dict:
+        coalesced = self.flight.counters["coalesced"]
+        lookups = self.counters["hits"] + coalesced + self.counters["misses"]
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            **self.counters,
+            "coalesced": coalesced,
+            "hit_ratio": (self.counters["hits"] + coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from fastapi import HTTPException
+
+import hashlib
+import time
+import jwt
+
+from utils.single_flight import SingleFlight
+
+
+class TokenVerificationCache:
+    # Bounded LRU of verified tokens, each entry valid until the token's exp claim
+    def __init__(self, max_entries: int = 10000, max_ttl: float = 300.0, secret: str = None, algorithms=("HS256",)):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.secret = secret
+        self.algorithms = list(algorithms)
+        self.entries = OrderedDict()
+        self.flight = SingleFlight()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "local": 0, "remote": 0}
+
+    @staticmethod
+    def cache_key(token: str) -> str:
+        # Raw tokens are never kept in memory as keys
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def token_expiry(token: str):
+        try:
+            claims = jwt.decode(token.removeprefix("Bearer "), options={"verify_signature": False})
+        except jwt.PyJWTError:
+            return None
+        return claims.get("exp")
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        username, expires_at = entry
+        if expires_at <= time.time():
+            del self.entries[key]
+            self.counters["expired"] += 1
+            return None
+        self.entries.move_to_end(key)
+        return username
+
+    def put(self, key: str, username: str, exp=None):
+        expires_at = time.time() + self.max_ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= time.time():
+            return
+        self.entries[key] = (username, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def verify_locally(self, token: str):
+        if not token.startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="Invalid token")
+        try:
+            claims = jwt.decode(token.removeprefix("Bearer "), self.secret, algorithms=self.algorithms)
+        except jwt.PyJWTError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        if "username" not in claims:
+            raise HTTPException(status_code=401, detail="Invalid user info")
+        return claims["username"], claims.get("exp")
+
+    async def verify(self, token: str, remote_verify) -> str:
+        key = self.cache_key(token)
+        username = self.get(key)
+        if username is not None:
+            self.counters["hits"] += 1
+            return username
+        self.counters["misses"] += 1
+
+        if self.secret:
+            self.counters["local"] += 1
+            username, exp = self.verify_locally(token)
+            self.put(key, username, exp)
+            return username
+
+        # Concurrent misses for the same token share one auth-service call
+        async def verify_remotely():
+            self.counters["remote"] += 1
+            username = await remote_verify(token)
+            self.put(key, username, self.token_expiry(token))
+            return username
+
+        return await self.flight.do(key, verify_remotely)
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "local_verification": bool(self.secret),
+            **self.counters,
+            "coalesced": self.flight.counters["coalesced"],
+            "hit_ratio": self.counters["hits"] / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,130 @@
+import httpx
+import os
+
+from utils.headers import header_items
+from utils.metrics import REQUEST_ID_HEADER, current_request_id, track_upstream
+
+# GLOBAL
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "false").lower() == "true"
+
+# Per-upstream timeouts, overridable with e.g. EXPLORATION_TIMEOUT=120
+DEFAULT_TIMEOUTS = {
+    "collection": 30.0,
+    "auth": 10.0,
+    "exploration": 60.0,
+}
+
+
+def http2_available():
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class UpstreamClients:
+    # One pooled httpx.AsyncClient per upstream, living as long as the gateway
+    def __init__(self, upstreams: dict):
+        self.upstreams = upstreams
+        self.clients = {}
+        self.counters = {name: {"requests": 0, "errors": 0, "in_flight": 0} for name in upstreams}
+
+    def timeout_for(self, name: str) -> float:
+        return float(os.getenv(f"{name.upper()}_TIMEOUT", DEFAULT_TIMEOUTS.get(name, 60.0)))
+
+    async def start(self):
+        limits = httpx.Limits(
+            max_connections=UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+        )
+        http2 = UPSTREAM_HTTP2 and http2_available()
+        if UPSTREAM_HTTP2 and not http2:
+            print("UPSTREAM_HTTP2 is enabled but the 'h2' package is not installed, falling back to HTTP/1.1")
+
+        for name, base_url in self.upstreams.items():
+            self.clients[name] = httpx.AsyncClient(
+                base_url=base_url,
+                limits=limits,
+                timeout=httpx.Timeout(self.timeout_for(name)),
+                http2=http2,
+            )
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients = {}
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        if name not in self.clients:
+            raise RuntimeError(f"Upstream client '{name}' is not started")
+        return self.clients[name]
+
+    @staticmethod
+    def with_request_id(kwargs: dict) -> dict:
+        # Every hop sees the request id the gateway assigned, so one request can be traced end to end
+        request_id = current_request_id()
+        if request_id:
+            headers = [(key, value) for key, value in header_items(kwargs.get("headers") or {}) if key.lower() != REQUEST_ID_HEADER.lower()]
+            kwargs["headers"] = [*headers, (REQUEST_ID_HEADER, request_id)]
+        return kwargs
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        counters = self.counters[name]
+        counters["requests"] += 1
+        counters["in_flight"] += 1
+        try:
+            with track_upstream(name, method):
+                return await self.get(name).request(method, url, **self.with_request_id(kwargs))
+        except httpx.HTTPError:
+            counters["errors"] += 1
+            raise
+        finally:
+            counters["in_flight"] -= 1
+
+    async def open_stream(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        # The response body is not read, the caller must release it with close_stream
+        counters = self.counters[name]
+        counters["requests"] += 1
+        counters["in_flight"] += 1
+        try:
+            client = self.get(name)
+            # Timed until the upstream's response headers, the body is relayed afterwards
+            with track_upstream(name, f"{method} stream"):
+                return await client.send(client.build_request(method, url, **self.with_request_id(kwargs)), stream=True)
+        except (httpx.HTTPError, RuntimeError):
+            counters["errors"] += 1
+            counters["in_flight"] -= 1
+            raise
+
+    async def close_stream(self, name: str, response: httpx.Response):
+        try:
+            await response.aclose()
+        finally:
+            self.counters[name]["in_flight"] -= 1
+
+    def pool_usage(self, name: str) -> dict:
+        # httpcore does not expose pool stats publicly, so read them defensively
+        pool = getattr(getattr(self.clients.get(name), "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "connections": len(connections),
+            "idle": idle,
+            "active": len(connections) - idle,
+        }
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "base_url": base_url,
+                "timeout": self.timeout_for(name),
+                **self.counters[name],
+                "pool": self.pool_usage(name),
+            }
+            for name, base_url in self.upstreams.items()
+        }
@@ -0,0 +1,85 @@
+# Overload of POST /explore against a single, serial (CPU-bound) fake Ollama, with and without
+# admission control. One heavy user fires a burst while several light users send one request each;
+# without a limit every request queues at Ollama and the tail grows with the burst, with it the
+# excess is shed with 429 early and each user gets a fair turn.
+#
+#   python benchmarks/bench_admission.py
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from mongomock_motor import AsyncMongoMockClient
+
+from common import ServerThread, load_service, percentile, wait_until_ready
+from fake_upstreams import fake_ollama
+
+
+def summarize(latencies: list) -> dict:
+    if not latencies:
+        return {"count": 0}
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+    }
+
+
+async def measure(args, max_in_flight: int) -> dict:
+    service = load_service("exploration-service", {
+        "OLLAMA_URL": f"http://127.0.0.1:{args.ollama_port}",
+        "PLANET_POOL_SIZE": "0",
+        "EXPLORE_MAX_IN_FLIGHT": str(max_in_flight),
+        "EXPLORE_QUEUE_SIZE": str(args.queue_size),
+        "EXPLORE_QUEUE_PER_USER": str(args.queue_per_user),
+    })
+    service.planet_repository = service.PlanetRepository(AsyncMongoMockClient()["exploration_db"]["planets"])
+
+    with ServerThread(service.app, args.service_port) as server:
+        async with httpx.AsyncClient(base_url=server.url, timeout=None) as client:
+            await wait_until_ready(client, "/ready")
+            served = {"heavy": [], "light": []}
+            shed = {"heavy": 0, "light": 0}
+
+            async def send(kind: str, username: str):
+                start = time.perf_counter()
+                response = await client.post("/explore", headers={"X-Username": username})
+                if response.status_code == 429:
+                    shed[kind] += 1
+                else:
+                    response.raise_for_status()
+                    served[kind].append(time.perf_counter() - start)
+
+            heavy = [send("heavy", "heavy") for _ in range(args.heavy_requests)]
+            light = [send("light", f"light-{index}") for index in range(args.light_users)]
+            await asyncio.gather(*heavy, *light)
+            admission = (await client.get("/admin/admission")).json()
+
+    return {
+        "max_in_flight": max_in_flight or "unlimited",
+        **{f"{kind}_served": summarize(latencies) for kind, latencies in served.items()},
+        **{f"{kind}_shed": count for kind, count in shed.items()},
+        "enqueued": admission["enqueued"],
+    }
+
+
+async def run(args):
+    with ServerThread(fake_ollama(args.latency, serial=True), args.ollama_port):
+        results = [await measure(args, limit) for limit in (0, args.max_in_flight)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--heavy-requests", type=int, default=30)
+    parser.add_argument("--light-users", type=int, default=5)
+    parser.add_argument("--max-in-flight", type=int, default=1)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--queue-per-user", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--ollama-port", type=int, default=18434)
+    parser.add_argument("--service-port", type=int, default=18004)
+    asyncio.run(run(parser.parse_args()))
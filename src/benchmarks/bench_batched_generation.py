@@ -0,0 +1,58 @@
+# Planets per second from a single, serial (CPU-bound) fake Ollama, with and without batching.
+# Each call costs --latency plus --per-extra-planet for every additional planet in a batch,
+# so batching amortizes the fixed per-call cost across the planets it returns.
+#
+#   python benchmarks/bench_batched_generation.py
+import argparse
+import asyncio
+import json
+
+import httpx
+from mongomock_motor import AsyncMongoMockClient
+
+from common import ServerThread, drive, load_service, wait_until_ready
+from fake_upstreams import fake_ollama
+
+
+async def measure(args, batch_size: int) -> dict:
+    service = load_service("exploration-service", {
+        "OLLAMA_URL": f"http://127.0.0.1:{args.ollama_port}",
+        "PLANET_POOL_SIZE": "0",
+        "EXPLORE_MAX_IN_FLIGHT": "0",
+        "PLANET_BATCH_SIZE": str(batch_size),
+        "PLANET_BATCH_WINDOW_MS": str(args.window_ms),
+    })
+    service.planet_repository = service.PlanetRepository(AsyncMongoMockClient()["exploration_db"]["planets"])
+
+    with ServerThread(service.app, args.service_port) as server:
+        async with httpx.AsyncClient(base_url=server.url, timeout=None) as client:
+            await wait_until_ready(client, "/ready")
+
+            async def send():
+                response = await client.post("/explore", headers={"X-Username": "bench"})
+                response.raise_for_status()
+
+            result = await drive(send, args.requests, args.concurrency)
+            batcher = (await client.get("/admin/planet-pool")).json()["batcher"]
+
+    return {"batch_size": batch_size, **result, "avg_batch_size": batcher["avg_batch_size"], "fallbacks": batcher["fallbacks"]}
+
+
+async def run(args):
+    ollama_app = fake_ollama(args.latency, per_extra_planet=args.per_extra_planet, serial=True)
+    with ServerThread(ollama_app, args.ollama_port):
+        results = [await measure(args, batch_size) for batch_size in (1, args.batch_size)]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=4)
+    parser.add_argument("--window-ms", type=float, default=50)
+    parser.add_argument("--latency", type=float, default=0.4)
+    parser.add_argument("--per-extra-planet", type=float, default=0.1)
+    parser.add_argument("--ollama-port", type=int, default=18434)
+    parser.add_argument("--service-port", type=int, default=18003)
+    asyncio.run(run(parser.parse_args()))
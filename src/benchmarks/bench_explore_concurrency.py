@@ -0,0 +1,50 @@
+# Concurrent POST /explore against a fake Ollama with a fixed generation latency.
+# With blocking upstream calls the requests serialize (elapsed ~ requests x latency);
+# with async I/O they overlap (elapsed ~ requests / concurrency x latency).
+#
+#   python benchmarks/bench_explore_concurrency.py
+import argparse
+import asyncio
+import json
+
+import httpx
+from mongomock_motor import AsyncMongoMockClient
+
+from common import ServerThread, drive, load_service, wait_until_ready
+from fake_upstreams import fake_ollama
+
+
+async def run(args):
+    with ServerThread(fake_ollama(args.latency), args.ollama_port) as ollama:
+        # Pool disabled so every request pays the upstream call being measured, admission control
+        # disabled so a single user's burst is not shed
+        service = load_service("exploration-service", {"OLLAMA_URL": ollama.url, "PLANET_POOL_SIZE": "0", "EXPLORE_MAX_IN_FLIGHT": "0"})
+        # mongomock stands in for MongoDB, this benchmark only measures upstream overlap
+        service.planet_repository = service.PlanetRepository(AsyncMongoMockClient()["exploration_db"]["planets"])
+
+        with ServerThread(service.app, args.service_port) as server:
+            async with httpx.AsyncClient(base_url=server.url, timeout=None) as client:
+                await wait_until_ready(client, "/ready")
+                async def send():
+                    response = await client.post("/explore", headers={"X-Username": "bench"})
+                    response.raise_for_status()
+
+                # Warm-up request so connection setup is not measured
+                await drive(send, 1, 1)
+                # Latency of /latest while explores are in flight shows whether the loop is blocked
+                explore = asyncio.create_task(drive(send, args.requests, args.concurrency))
+                await asyncio.sleep(args.latency / 2)
+                latest = await drive(lambda: client.get("/latest"), 10, 1)
+                results = {"explore": await explore, "latest_during_explore": latest, "upstream_latency_s": args.latency}
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--ollama-port", type=int, default=18434)
+    parser.add_argument("--service-port", type=int, default=18002)
+    asyncio.run(run(parser.parse_args()))
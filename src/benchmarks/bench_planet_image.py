@@ -0,0 +1,99 @@
+# Micro-benchmark of the NumPy planet renderer against the original per-pixel implementation,
+# also checking that both produce identical pixels for the same seed.
+#
+#   python benchmarks/bench_planet_image.py
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import timeit
+
+from PIL import Image, ImageDraw
+
+from common import SRC_DIR
+
+sys.path.insert(0, os.path.join(SRC_DIR, "exploration-service"))
+from utils.image_generation import generate_planet_image  # noqa: E402
+
+
+def reference_planet_image(color_base: str, color_extra: str):
+    # The original implementation, kept verbatim as the baseline
+    width, height = 512, 512
+
+    img = Image.new("RGB", (width, height), "#0d1b2a")
+    draw = ImageDraw.Draw(img)
+
+    num_stars = 100
+    for _ in range(num_stars):
+        x, y = random.randint(0, width - 1), random.randint(0, height - 1)
+        draw.point((x, y), fill="white")
+
+    planet_diameter = width // 3
+    planet_radius = planet_diameter // 2
+    planet_x = (width - planet_diameter) // 2
+    planet_y = (height - planet_diameter) // 2
+
+    for x_offset in range(planet_diameter):
+        for y_offset in range(planet_diameter):
+            distance_ratio = (x_offset + y_offset) / (2 * planet_diameter)
+            blended_color = (
+                int(int(color_base[1:3], 16) * (1 - distance_ratio) + int(color_extra[1:3], 16) * distance_ratio),
+                int(int(color_base[3:5], 16) * (1 - distance_ratio) + int(color_extra[3:5], 16) * distance_ratio),
+                int(int(color_base[5:7], 16) * (1 - distance_ratio) + int(color_extra[5:7], 16) * distance_ratio),
+            )
+            if (x_offset - planet_radius) ** 2 + (y_offset - planet_radius) ** 2 <= planet_radius ** 2:
+                draw.point((planet_x + x_offset, planet_y + y_offset), fill=blended_color)
+
+    border_width = 4
+    border_color = "black"
+    draw.ellipse(
+        [
+            (planet_x - border_width, planet_y - border_width),
+            (planet_x + planet_diameter + border_width, planet_y + planet_diameter + border_width),
+        ],
+        outline=border_color,
+        width=border_width,
+    )
+
+    image_bytes = io.BytesIO()
+    img.save(image_bytes, format="PNG")
+
+    return image_bytes.getvalue()
+
+
+def pixels(png: bytes) -> bytes:
+    return Image.open(io.BytesIO(png)).convert("RGB").tobytes()
+
+
+def check_identical(samples: int) -> bool:
+    rng = random.Random(0)
+    for seed in range(samples):
+        color_base = "#%06x" % rng.randint(0, 0xFFFFFF)
+        color_extra = "#%06x" % rng.randint(0, 0xFFFFFF)
+        random.seed(seed)
+        expected = pixels(reference_planet_image(color_base, color_extra))
+        for image_format in ("PNG", "WEBP"):
+            if pixels(generate_planet_image(color_base, color_extra, image_format=image_format, seed=seed)) != expected:
+                return False
+    return True
+
+
+def run(args):
+    timings = {
+        "reference_ms": timeit.timeit(lambda: reference_planet_image("#3366ff", "#ff9933"), number=args.number) / args.number * 1000,
+        "vectorized_png_ms": timeit.timeit(lambda: generate_planet_image("#3366ff", "#ff9933"), number=args.number) / args.number * 1000,
+        "vectorized_webp_ms": timeit.timeit(lambda: generate_planet_image("#3366ff", "#ff9933", image_format="WEBP"), number=args.number) / args.number * 1000,
+    }
+    results = {key: round(value, 2) for key, value in timings.items()}
+    results["speedup_png"] = round(timings["reference_ms"] / timings["vectorized_png_ms"], 1)
+    results["pixel_identical"] = check_identical(args.samples)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--samples", type=int, default=10)
+    run(parser.parse_args())
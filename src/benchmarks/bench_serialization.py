@@ -0,0 +1,99 @@
+# CPU and bytes on the wire per GET /exploration/planets/all: the response-building cost of the
+# previous path (a Pydantic model per stored document, stdlib JSON) against serializing the stored
+# documents with orjson, and the response size through the gateway per Accept-Encoding.
+#
+#   python benchmarks/bench_serialization.py
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import timeit
+
+import httpx
+from fastapi.responses import JSONResponse
+from mongomock_motor import AsyncMongoMockClient
+
+from common import SRC_DIR, ServerThread, load_service
+from fake_upstreams import fake_auth
+
+
+def reference_list_response(service, page: list):
+    # The previous path: every document wrapped in a model, dumped, then encoded by JSONResponse
+    return JSONResponse(content=[service.PlanetDetail(**planet).model_dump(by_alias=True) for planet in page])
+
+
+def planet(index: int) -> dict:
+    return {
+        "name": f"Planet {index}",
+        "color_base": f"#{random.randrange(1 << 24):06x}",
+        "color_extra": f"#{random.randrange(1 << 24):06x}",
+        "mass": random.uniform(1e22, 1e27),
+        "radius": random.uniform(1e3, 1e5),
+        "gravity": random.uniform(1, 30),
+        "temperature": random.uniform(-200, 500),
+        "civilization": "Crystalline hive minds",
+        "main_event": " ".join(random.choice(["ancient", "storm", "signal", "empire", "ocean", "eclipse", "migration"]) for _ in range(100)),
+        "demonym": f"Planetian {index}",
+        "representative": f"Envoy {index}",
+        "username": f"user-{index % 10}",
+    }
+
+
+def per_call_us(function, repeat: int) -> float:
+    return round(min(timeit.repeat(function, number=repeat, repeat=5)) / repeat * 1e6, 1)
+
+
+async def wire_bytes(client: httpx.AsyncClient, url: str, headers: dict) -> dict:
+    sizes = {}
+    for accept_encoding in ("identity", "gzip", "br"):
+        async with client.stream("GET", url, headers={**headers, "Accept-Encoding": accept_encoding}) as response:
+            response.raise_for_status()
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+        sizes[accept_encoding] = {"bytes": len(body), "content_encoding": response.headers.get("content-encoding", "identity")}
+    return sizes
+
+
+async def run(args):
+    random.seed(args.seed)
+    exploration = load_service("exploration-service", {"PLANET_POOL_SIZE": "0", "OLLAMA_WARMUP": "false"})
+    exploration.planet_repository = exploration.PlanetRepository(AsyncMongoMockClient()["exploration_db"]["planets"])
+    for index in range(args.planets):
+        await exploration.planet_repository.insert(exploration.PlanetDetail(**planet(index)).model_dump(by_alias=True))
+    page = await exploration.planet_repository.find_page({})
+
+    with ServerThread(fake_auth(0), args.base_port) as auth, ServerThread(exploration.app, args.base_port + 1) as exploration_server:
+        gateway = load_service("api-gateway", {"EXPLORATION_SERVICE_URL": exploration_server.url, "AUTH_SERVICE_URL": auth.url, "GATEWAY_INTERNAL_PORT": "0"})
+        # The gateway's own utils package is the one imported now
+        compression = importlib.import_module("utils.compression")
+        with ServerThread(gateway.app, args.base_port + 2, cwd=os.path.join(SRC_DIR, "api-gateway")) as gateway_server:
+            async with httpx.AsyncClient(timeout=None) as client:
+                url = f"{gateway_server.url}/exploration/planets/all"
+                cached = await wire_bytes(client, url, {"Authorization": "Bearer bench"})
+                gateway.RESPONSE_CACHE_ENABLED = False
+                uncached = await wire_bytes(client, url, {"Authorization": "Bearer bench"})
+
+    body = exploration.ORJSONResponse(content=[exploration.planet_document(planet) for planet in page]).body
+    results = {
+        "planets": len(page),
+        "serialization_us_per_request": {
+            "pydantic_stdlib_json": per_call_us(lambda: reference_list_response(exploration, page), args.repeat),
+            "documents_orjson": per_call_us(lambda: exploration.ORJSONResponse(content=[exploration.planet_document(planet) for planet in page]), args.repeat),
+        },
+        "compression_us_per_uncached_response": {
+            encoding: per_call_us(lambda encoding=encoding: compression.compress(body, encoding), args.repeat)
+            for encoding in compression.ENCODINGS
+        },
+        "gateway_wire_bytes": {"cached": cached, "uncached": uncached},
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--planets", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-port", type=int, default=18600)
+    asyncio.run(run(parser.parse_args()))
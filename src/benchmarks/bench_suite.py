@@ -0,0 +1,142 @@
+# Load-test suite: every service driven over HTTP (uvicorn in-process) against local stand-ins
+# (fixture SPARQL endpoint, fake Ollama, stub /verify, mongomock), at fixed concurrency levels.
+# Results (p50/p95/p99 latency, RPS) go to a JSON file; --baseline compares with an earlier run.
+#
+#   python benchmarks/bench_suite.py --label before
+#   python benchmarks/bench_suite.py --label after --baseline benchmarks/results/before.json
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+
+import httpx
+from mongomock_motor import AsyncMongoMockClient
+
+from common import BENCHMARKS_DIR, SRC_DIR, ServerThread, drive, load_service, wait_until_ready
+from fake_upstreams import fake_auth, fake_ollama, fake_sparql
+
+COMPARED_FIELDS = ("p50_ms", "p95_ms", "p99_ms", "rps")
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+async def sweep(client: httpx.AsyncClient, method: str, path: str, levels: list, requests: int, headers: dict = None) -> list:
+    async def send():
+        response = await client.request(method, path, headers=headers)
+        response.raise_for_status()
+
+    # Warm-up request so connection setup and first-call caches are not measured
+    await drive(send, 1, 1)
+    return [await drive(send, max(requests, level), level) for level in levels]
+
+
+async def run(args):
+    levels = [int(level) for level in args.concurrency.split(",")]
+    ports = iter(range(args.base_port, args.base_port + 10))
+    headers = {"Authorization": "Bearer bench"}
+    scenarios = {}
+
+    sparql_app = fake_sparql(args.sparql_latency)
+    with ServerThread(sparql_app, next(ports)) as sparql, \
+            ServerThread(fake_auth(args.auth_latency), next(ports)) as auth, \
+            ServerThread(fake_ollama(args.ollama_latency, token_latency=args.token_latency), next(ports)) as ollama:
+
+        collection = load_service("celestial-collection", {
+            "WIKIDATA_SPARQL_URL": f"{sparql.url}/sparql",
+            "CATALOG_SNAPSHOT_PATH": "",
+            "CATALOG_OFFLINE": "false",
+        })
+        # Admission control is measured on its own by bench_admission.py, here it would shed the single bench user
+        exploration = load_service("exploration-service", {"OLLAMA_URL": ollama.url, "PLANET_POOL_SIZE": "0", "EXPLORE_MAX_IN_FLIGHT": "0"})
+        exploration.planet_repository = exploration.PlanetRepository(AsyncMongoMockClient()["exploration_db"]["planets"])
+
+        with ServerThread(collection.app, next(ports)) as collection_server, \
+                ServerThread(exploration.app, next(ports)) as exploration_server:
+            gateway = load_service("api-gateway", {
+                "COLLECTION_SERVICE_URL": collection_server.url,
+                "AUTH_SERVICE_URL": auth.url,
+                "EXPLORATION_SERVICE_URL": exploration_server.url,
+                "GATEWAY_INTERNAL_PORT": "0",
+            })
+            with ServerThread(gateway.app, next(ports), cwd=os.path.join(SRC_DIR, "api-gateway")) as gateway_server:
+                async with httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=max(levels))) as client:
+                    await wait_until_ready(client, f"{exploration_server.url}/ready")
+                    # Cold burst: concurrent first requests for an empty catalog, counted upstream queries
+                    queries_before = sparql_app.state.queries
+                    cold = await drive(lambda: client.get(f"{collection_server.url}/planets/Jupiter/moons"), levels[-1], levels[-1])
+                    scenarios["collection_cold_burst"] = [{**cold, "sparql_queries": sparql_app.state.queries - queries_before}]
+
+                    scenarios["collection_direct"] = await sweep(client, "GET", f"{collection_server.url}/planets/details", levels, args.requests)
+                    scenarios["gateway_collection_cached"] = await sweep(client, "GET", f"{gateway_server.url}/collection/planets/details", levels, args.requests, headers)
+
+                    gateway.RESPONSE_CACHE_ENABLED = False
+                    scenarios["gateway_collection_uncached"] = await sweep(client, "GET", f"{gateway_server.url}/collection/planets/details", levels, args.requests, headers)
+                    scenarios["gateway_exploration_latest"] = await sweep(client, "GET", f"{gateway_server.url}/exploration/latest", levels, args.requests, headers)
+                    gateway.RESPONSE_CACHE_ENABLED = True
+
+                    scenarios["gateway_explore"] = await sweep(client, "POST", f"{gateway_server.url}/exploration/explore", levels, args.explore_requests, headers)
+
+    return {
+        "label": args.label,
+        "git_commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": {key: value for key, value in vars(args).items() if key not in ("label", "output", "baseline")},
+        "scenarios": scenarios,
+    }
+
+
+def compare(results: dict, baseline: dict):
+    print(f"\n{'scenario':32} {'conc':>5} " + " ".join(f"{field:>22}" for field in COMPARED_FIELDS))
+    for name, runs in results["scenarios"].items():
+        baseline_runs = {run["concurrency"]: run for run in baseline.get("scenarios", {}).get(name, [])}
+        for run in runs:
+            before = baseline_runs.get(run["concurrency"])
+            cells = []
+            for field in COMPARED_FIELDS:
+                if before and before.get(field):
+                    change = (run[field] - before[field]) / before[field] * 100
+                    cells.append(f"{before[field]:>8} -> {run[field]:>8} {change:+5.0f}%")
+                else:
+                    cells.append(f"{run[field]:>22}")
+            print(f"{name:32} {run['concurrency']:>5} " + " ".join(f"{cell:>22}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--label", default=datetime.datetime.now().strftime("%Y%m%d-%H%M%S"))
+    parser.add_argument("--output", default=None, help="results file, defaults to benchmarks/results/<label>.json")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--concurrency", default="1,10,50", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=500, help="requests per level for the read scenarios")
+    parser.add_argument("--explore-requests", type=int, default=50, help="requests per level for /explore")
+    parser.add_argument("--sparql-latency", type=float, default=0.2)
+    parser.add_argument("--auth-latency", type=float, default=0.005)
+    parser.add_argument("--ollama-latency", type=float, default=0.5)
+    parser.add_argument("--token-latency", type=float, default=None, help="per-token delay of the fake Ollama")
+    parser.add_argument("--base-port", type=int, default=18500)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    output = args.output or os.path.join(BENCHMARKS_DIR, "results", f"{args.label}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    print(json.dumps(results["scenarios"], indent=2))
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare(results, json.load(file))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
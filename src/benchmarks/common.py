@@ -0,0 +1,113 @@
+import asyncio
+import importlib
+import os
+import sys
+import threading
+import time
+
+import httpx
+import uvicorn
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+
+def load_service(service_dir: str, env: dict = None):
+    # Each service is a flat "main.py + utils/" app, so import it from its own directory
+    for key, value in (env or {}).items():
+        os.environ[key] = value
+    path = os.path.join(SRC_DIR, service_dir)
+    for module in [name for name in sys.modules if name == "main" or name == "utils" or name.startswith("utils.")]:
+        del sys.modules[module]
+    # The path stays first on sys.path, spawned worker processes re-import the service's utils from it
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(0, path)
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        return importlib.import_module("main")
+    finally:
+        os.chdir(cwd)
+
+
+class ServerThread:
+    # Runs an ASGI app with uvicorn in a background thread
+    def __init__(self, app, port: int, cwd: str = None):
+        self.config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(self.config)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.cwd = cwd
+        self.url = f"http://127.0.0.1:{port}"
+
+    def run(self):
+        if self.cwd:
+            os.chdir(self.cwd)
+        self.server.run()
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def wait_until_ready(client, url: str, timeout: float = 60.0):
+    # Polls a readiness endpoint, e.g. exploration-service's /ready while it warms up its model
+    deadline = time.perf_counter() + timeout
+    while (await client.get(url)).status_code != 200:
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"{url} not ready after {timeout}s")
+        await asyncio.sleep(0.05)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    # Nearest-rank percentile of an already sorted list
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def drive(send, total: int, concurrency: int) -> dict:
+    # Fires `total` calls of `send` with at most `concurrency` in flight
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    # 429s from admission control are shed load, not failures
+    rejected = 0
+
+    async def one():
+        nonlocal errors, rejected
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await send()
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code == 429:
+                    rejected += 1
+                else:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rejected": rejected,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+    }
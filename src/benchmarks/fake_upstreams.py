@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+import re
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+FAKE_PLANET = {
+    "name": "Benchmarkia", "color_base": "#3366ff", "color_extra": "#ff9933", "mass": "5.9e24", "radius": "6371",
+    "gravity": "9.8", "temperature": "15", "civilization": "Synthetic testers", "main_event": "A very long benchmark.",
+    "demonym": "Benchmarkian", "representative": "Ada",
+}
+
+
+def fake_ollama(latency: float = None, token_size: int = 4, per_extra_planet: float = 0.0, serial: bool = False, token_latency: float = None) -> FastAPI:
+    # Ollama stand-in answering /api/generate after a fixed delay. Streamed requests get
+    # the same total latency spread evenly over tokens of `token_size` characters, or
+    # `token_latency` per token when set (the total then grows with the response length).
+    # Batch prompts ("creating N planets") return N planets and cost `per_extra_planet` more
+    # per additional planet. `serial` handles one generation at a time, like a CPU-bound Ollama.
+    latency = float(os.getenv("FAKE_OLLAMA_LATENCY", "0.5")) if latency is None else latency
+    lock = asyncio.Lock() if serial else None
+    app = FastAPI()
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "gemma2:2b-instruct-q4_K_M", "model": "gemma2:2b-instruct-q4_K_M"}]}
+
+    @app.post("/api/pull")
+    async def pull():
+        return {"status": "success"}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        text = json.dumps(FAKE_PLANET)
+        delay = latency
+
+        batch = re.search(r"creating (\d+) planets", body.get("prompt", ""))
+        if batch:
+            count = int(batch.group(1))
+            text = json.dumps({"planets": [{**FAKE_PLANET, "name": f"Benchmarkia {index}"} for index in range(count)]})
+            delay = latency + per_extra_planet * (count - 1)
+
+        if body.get("stream", True):
+            tokens = [text[i:i + token_size] for i in range(0, len(text), token_size)]
+
+            per_token = token_latency if token_latency is not None else latency / len(tokens)
+
+            async def stream_tokens():
+                for token in tokens:
+                    await asyncio.sleep(per_token)
+                    yield json.dumps({"model": body.get("model"), "response": token, "done": False}) + "\n"
+                yield json.dumps({"model": body.get("model"), "response": "", "done": True}) + "\n"
+
+            return StreamingResponse(stream_tokens(), media_type="application/x-ndjson")
+
+        if token_latency is not None:
+            delay = token_latency * len(text) / token_size
+        if lock is not None:
+            async with lock:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(delay)
+        return {"model": body.get("model"), "response": text, "done": True}
+
+    return app
+
+
+def fake_sparql(latency: float = 0.0) -> FastAPI:
+    # Wikidata SPARQL stand-in serving fixture results in the application/sparql-results+json
+    # format, picked by the shape of the query. `app.state.queries` counts the queries received.
+    fixtures = {}
+    for name in ("planets", "planet_details", "moons"):
+        with open(os.path.join(FIXTURES_DIR, "sparql", f"{name}.json")) as file:
+            fixtures[name] = json.load(file)
+    app = FastAPI()
+    app.state.queries = 0
+
+    @app.get("/sparql")
+    async def sparql(query: str):
+        app.state.queries += 1
+        await asyncio.sleep(latency)
+        if "wdt:P398" in query:
+            return fixtures["moons"]
+        if "VALUES ?planetName" in query:
+            return fixtures["planet_details"]
+        return fixtures["planets"]
+
+    return app
+
+
+def fake_auth(latency: float = 0.0) -> FastAPI:
+    # auth-service stand-in: "Bearer <username>" is a valid token for <username>
+    app = FastAPI()
+
+    @app.get("/verify")
+    async def verify(request: Request):
+        await asyncio.sleep(latency)
+        token = request.headers.get("Authorization", "")
+        if not token.startswith("Bearer ") or not token.removeprefix("Bearer "):
+            raise HTTPException(status_code=401, detail="Invalid token")
+        return {"user": {"username": token.removeprefix("Bearer ")}}
+
+    return app
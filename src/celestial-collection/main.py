@@ -1,16 +1,43 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Optional
-import requests
+import bisect
+import os
+import random
+import httpx
 
 from fastapi.middleware.cors import CORSMiddleware
 
+from utils.catalog_cache import CatalogCache
+from utils.http_client import AsyncHTTPClient
+from utils.metrics import MetricsMiddleware, registry, track_cache, CONTENT_TYPE as METRICS_CONTENT_TYPE
+
 # GLOBAL
-WIKIDATA_SPARQL_URL = "https://query.wikidata.org/sparql"
+WIKIDATA_SPARQL_URL = os.getenv("WIKIDATA_SPARQL_URL", "https://query.wikidata.org/sparql")
 VALID_PLANET_NAMES = ["Earth", "Mars", "Saturn", "Venus", "Mercury", "Uranus", "Neptune", "Jupiter"]
+MOONS_SAMPLE_SIZE = int(os.getenv("MOONS_SAMPLE_SIZE", "10"))
+MOONS_MAX_LIMIT = int(os.getenv("MOONS_MAX_LIMIT", "100"))
+
+# HTTP CLIENT
+http_client = AsyncHTTPClient(
+    timeout=float(os.getenv("WIKIDATA_TIMEOUT", "30")),
+    retries=int(os.getenv("WIKIDATA_RETRIES", "2")),
+    target="wikidata",
+)
+
+# CATALOG CACHE
+catalog = CatalogCache(
+    ttl=float(os.getenv("CATALOG_TTL", "86400")),
+    stale_ttl=float(os.getenv("CATALOG_STALE_TTL", "604800")),
+    snapshot_path=os.getenv("CATALOG_SNAPSHOT_PATH", "catalog_snapshot.json"),
+    bundle_path=os.getenv("CATALOG_BUNDLE_PATH", "data/catalog.json"),
+    offline=os.getenv("CATALOG_OFFLINE", "false").lower() == "true",
+)
+track_cache("catalog", catalog.stats)
 
 # APP
-app = FastAPI(title="Celestial Collection API", openapi_url="/openapi.json")
+app = FastAPI(title="Celestial Collection API", openapi_url="/openapi.json", default_response_class=ORJSONResponse)
 
 # CORS
 app.add_middleware(
@@ -21,6 +48,19 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+# METRICS
+app.add_middleware(MetricsMiddleware)
+
+# STARTUP EVENTS
+@app.on_event("startup")
+async def startup_event():
+    await http_client.start()
+    catalog.load()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await http_client.close()
+
 # MODELS
 class PlanetBase(BaseModel):
     name: str
@@ -42,9 +82,8 @@ class Moon(BaseModel):
     discoverer: Optional[str] = "None"
 
 
-# ROUTES
-@app.get("/planets", response_model=List[PlanetBase])
-def get_planets():
+# WIKIDATA FETCHERS
+async def fetch_planets():
     headers = {
         "Accept": "application/sparql-results+json"
     }
@@ -68,7 +107,10 @@ def get_planets():
         GROUP BY ?planet ?planetLabel
     """
 
-    response = requests.get(WIKIDATA_SPARQL_URL, params={"query": query}, headers=headers)
+    try:
+        response = await http_client.get(WIKIDATA_SPARQL_URL, params={"query": query}, headers=headers)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=500, detail="Failed to fetch data from Wikidata")
 
     if response.status_code != 200:
         raise HTTPException(status_code=500, detail="Failed to fetch data from Wikidata")
@@ -85,23 +127,22 @@ def get_planets():
         planets.append(PlanetBase(
             name=name,
             distanceFromEarth=distance_from_earth
-        ))
+        ).model_dump())
 
     return planets
 
 
-@app.get("/planets/{planet_name}", response_model=PlanetDetail)
-def get_planet_details(planet_name: str):
-
-    if planet_name not in VALID_PLANET_NAMES:
-        raise HTTPException(status_code=400, detail=f"Planet '{planet_name}' is not a valid planet. Choose from: {', '.join(VALID_PLANET_NAMES)}")
+def sparql_planet_names():
+    return " ".join(f'"{planet_name}"@en' for planet_name in VALID_PLANET_NAMES)
 
+async def fetch_all_planet_details():
     headers = {
         "Accept": "application/sparql-results+json"
     }
 
+    # One query for every valid planet instead of one per planet
     query = f"""
-        SELECT ?planet ?planetLabel 
+        SELECT ?planetName
         (SAMPLE(?distanceFromEarth) AS ?distanceFromEarth)
         (SAMPLE(IF(BOUND(?temperature), ?temperature, "-110")) AS ?temperature)
         (SAMPLE(?radius) AS ?radius)
@@ -110,6 +151,7 @@ def get_planet_details(planet_name: str):
         (SAMPLE(?mass) AS ?mass)
         (SAMPLE(COALESCE(?demonymEng, ?demonymOther)) AS ?demonym)
     WHERE {{
+        VALUES ?planetName {{ {sparql_planet_names()} }}
         {{
             ?planet wdt:P31 wd:Q3504248 .
         }}
@@ -117,7 +159,7 @@ def get_planet_details(planet_name: str):
         {{
             ?planet wdt:P31 wd:Q30014 .
         }}
-        ?planet rdfs:label "{planet_name}"@en .
+        ?planet rdfs:label ?planetName .
         
         OPTIONAL {{ ?planet wdt:P2583 ?distanceFromEarth . }}
         OPTIONAL {{ ?planet wdt:P2076 ?temperature . }}
@@ -127,13 +169,14 @@ def get_planet_details(planet_name: str):
         OPTIONAL {{ ?planet wdt:P2067 ?mass . }}
         OPTIONAL {{ ?planet wdt:P1549 ?demonymEng . FILTER (lang(?demonymEng) = "en") }}
         OPTIONAL {{ ?planet wdt:P1549 ?demonymOther . }}
-        
-        SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
     }}
-    GROUP BY ?planet ?planetLabel
+    GROUP BY ?planetName
     """
 
-    response = requests.get(WIKIDATA_SPARQL_URL, params={"query": query}, headers=headers)
+    try:
+        response = await http_client.get(WIKIDATA_SPARQL_URL, params={"query": query}, headers=headers)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=500, detail="Failed to fetch data from Wikidata")
 
     if response.status_code != 200:
         raise HTTPException(status_code=500, detail="Failed to fetch data from Wikidata")
@@ -141,46 +184,43 @@ def get_planet_details(planet_name: str):
     data = response.json()
     results = data['results']['bindings']
 
-    if not results:
-        raise HTTPException(status_code=404, detail=f"Planet '{planet_name}' not found.")
+    planets = {}
 
-    result = results[0]
-
-    name = result['planetLabel']['value']
-    distance_from_earth = float(result['distanceFromEarth']['value']) if 'distanceFromEarth' in result else None
-    mass = float(result['mass']['value']) if 'mass' in result else None
-    radius = float(result['radius']['value']) if 'radius' in result else None
-    diameter = float(result['diameter']['value']) if 'diameter' in result else None
-    gravity = float(result['gravity']['value']) if 'gravity' in result else None
-    temperature = float(result['temperature']['value']) if 'temperature' in result else None
-    demonym = result['demonym']['value']
-
-    return PlanetDetail(
-        name=name,
-        distanceFromEarth=distance_from_earth,
-        mass=mass,
-        radius=radius,
-        diameter=diameter,
-        gravity=gravity,
-        temperature=temperature,
-        civilization="Humans" if name == "Earth" else "None",
-        demonym=demonym
-    )
+    for result in results:
+        name = result['planetName']['value']
+        distance_from_earth = float(result['distanceFromEarth']['value']) if 'distanceFromEarth' in result else None
+        mass = float(result['mass']['value']) if 'mass' in result else None
+        radius = float(result['radius']['value']) if 'radius' in result else None
+        diameter = float(result['diameter']['value']) if 'diameter' in result else None
+        gravity = float(result['gravity']['value']) if 'gravity' in result else None
+        temperature = float(result['temperature']['value']) if 'temperature' in result else None
+        demonym = result['demonym']['value'] if 'demonym' in result else "None"
+
+        planets[name] = PlanetDetail(
+            name=name,
+            distanceFromEarth=distance_from_earth,
+            mass=mass,
+            radius=radius,
+            diameter=diameter,
+            gravity=gravity,
+            temperature=temperature,
+            civilization="Humans" if name == "Earth" else "None",
+            demonym=demonym
+        ).model_dump()
 
-@app.get("/planets/{planet_name}/moons", response_model=List[Moon])
-def get_moons_for_planet(planet_name: str):
-    
+    return planets
+
+async def fetch_all_moons():
     headers = {
         "Accept": "application/sparql-results+json"
     }
 
-    if planet_name not in VALID_PLANET_NAMES:
-        raise HTTPException(status_code=400, detail=f"Planet '{planet_name}' is not a valid planet. Choose from: {', '.join(VALID_PLANET_NAMES)}")
-
+    # Full moon lists of every valid planet in one query, sampled locally per request
     query = f"""
-        SELECT ?moon ?moonLabel (SAMPLE(COALESCE(?discovererLabel, "Humanity")) AS ?discovererLabel)
+        SELECT ?planetName ?moon ?moonLabel (SAMPLE(COALESCE(?discovererLabel, "Humanity")) AS ?discovererLabel)
         WHERE {{
-            ?planet rdfs:label "{planet_name}"@en .
+            VALUES ?planetName {{ {sparql_planet_names()} }}
+            ?planet rdfs:label ?planetName .
             
             ?moon wdt:P397 ?planet .
             ?planet wdt:P398 ?moon .
@@ -209,13 +249,13 @@ def get_moons_for_planet(planet_name: str):
 
             SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
         }}
-        GROUP BY ?moon ?moonLabel
-        ORDER BY RAND()  # Randomize the results
-        LIMIT 10
- 
+        GROUP BY ?planetName ?moon ?moonLabel
     """
 
-    response = requests.get(WIKIDATA_SPARQL_URL, params={"query": query}, headers=headers)
+    try:
+        response = await http_client.get(WIKIDATA_SPARQL_URL, params={"query": query}, headers=headers)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=500, detail="Failed to fetch data from Wikidata")
 
     if response.status_code != 200:
         raise HTTPException(status_code=500, detail="Failed to fetch data from Wikidata")
@@ -223,19 +263,97 @@ def get_moons_for_planet(planet_name: str):
     data = response.json()
     results = data['results']['bindings']
 
-    moons = []
+    moons = {planet_name: [] for planet_name in VALID_PLANET_NAMES}
 
     for result in results:
+        planet_name = result['planetName']['value']
         name = result['moonLabel']['value']
         discoverer = result['discovererLabel']['value']
 
-        moons.append(Moon(
+        moons.setdefault(planet_name, []).append(Moon(
             name=name,
             discoverer=discoverer
-        ))
+        ).model_dump())
 
     return moons
 
+async def get_from_catalog(key: str, loader):
+    try:
+        return await catalog.get(key, loader)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"'{key}' is not available in offline mode.")
+
+# Per-planet moons sorted by name, rebuilt only when the catalog entry is replaced
+moon_index = {"source": None, "planets": {}}
+
+def get_moon_index(moons: dict) -> dict:
+    if moon_index["source"] is not moons:
+        planets = {}
+        for planet_name, planet_moons in moons.items():
+            ordered = sorted(planet_moons, key=lambda moon: moon["name"])
+            planets[planet_name] = (ordered, [moon["name"] for moon in ordered])
+        moon_index["planets"] = planets
+        moon_index["source"] = moons
+    return moon_index["planets"]
+
+# ROUTES
+@app.get("/planets", response_model=List[PlanetBase])
+async def get_planets():
+    planets = await get_from_catalog("planets", fetch_planets)
+    return [PlanetBase(**planet) for planet in planets]
+
+
+@app.get("/planets/details", response_model=List[PlanetDetail])
+async def get_all_planet_details():
+    planets = await get_from_catalog("planet_details", fetch_all_planet_details)
+    return [PlanetDetail(**planets[planet_name]) for planet_name in VALID_PLANET_NAMES if planet_name in planets]
+
+@app.get("/planets/{planet_name}", response_model=PlanetDetail)
+async def get_planet_details(planet_name: str):
+
+    if planet_name not in VALID_PLANET_NAMES:
+        raise HTTPException(status_code=400, detail=f"Planet '{planet_name}' is not a valid planet. Choose from: {', '.join(VALID_PLANET_NAMES)}")
+
+    planets = await get_from_catalog("planet_details", fetch_all_planet_details)
+    if planet_name not in planets:
+        raise HTTPException(status_code=404, detail=f"Planet '{planet_name}' not found.")
+    return PlanetDetail(**planets[planet_name])
+
+@app.get("/planets/{planet_name}/moons", response_model=List[Moon])
+async def get_moons_for_planet(
+    planet_name: str,
+    sample: int = Query(MOONS_SAMPLE_SIZE, ge=1, le=MOONS_MAX_LIMIT),
+    seed: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MOONS_MAX_LIMIT),
+    after: Optional[str] = None,
+):
+
+    if planet_name not in VALID_PLANET_NAMES:
+        raise HTTPException(status_code=400, detail=f"Planet '{planet_name}' is not a valid planet. Choose from: {', '.join(VALID_PLANET_NAMES)}")
+
+    moons, names = get_moon_index(await get_from_catalog("moons", fetch_all_moons)).get(planet_name, ([], []))
+
+    # Pagination walks the full list in name order, the cursor is the last name of the previous page
+    if limit is not None or after is not None:
+        start = bisect.bisect_right(names, after) if after is not None else 0
+        end = len(moons) if limit is None else start + limit
+        headers = {"X-Next-Cursor": names[end - 1]} if end < len(moons) else {}
+        return ORJSONResponse(content=[Moon(**moon).model_dump() for moon in moons[start:end]], headers=headers)
+
+    # Samples are drawn locally, a seed makes them reproducible (and cacheable)
+    rng = random.Random(seed) if seed is not None else random
+    moon_sample = rng.sample(moons, min(sample, len(moons)))
+    headers = {} if seed is not None else {"Cache-Control": "no-store"}
+    return ORJSONResponse(content=[Moon(**moon).model_dump() for moon in moon_sample], headers=headers)
+
+@app.get("/catalog/stats", include_in_schema=False)
+async def get_catalog_stats():
+    return catalog.stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 # DEBUG
 if __name__ == "__main__":
     # Use this for debugging purposes only
@@ -0,0 +1,71 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from utils.catalog_cache import CatalogCache
+
+
+def cache_for(path) -> CatalogCache:
+    return CatalogCache(ttl=60, stale_ttl=60, snapshot_path=str(path))
+
+
+@pytest.mark.parametrize("content", ['{"entries": {"planets": {"val', "", "[]", '{"entries": {"planets": 1}}', '{"entries": {"planets": {}}}'])
+def test_unreadable_snapshot_starts_empty(tmp_path, content):
+    path = tmp_path / "catalog.json"
+    path.write_text(content)
+    cache = cache_for(path)
+    cache.load()
+    assert cache.entries == {}
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = tmp_path / "catalog.json"
+    cache = cache_for(path)
+    cache.save({"planets": (["Mars"], 123.0)})
+    reloaded = cache_for(path)
+    reloaded.load()
+    assert reloaded.entries == {"planets": (["Mars"], 123.0)}
+    assert os.listdir(tmp_path) == ["catalog.json"]
+
+
+def test_concurrent_saves_leave_a_valid_snapshot(tmp_path):
+    path = tmp_path / "catalog.json"
+    cache = cache_for(path)
+
+    async def main():
+        await asyncio.gather(*[
+            asyncio.to_thread(cache.save, {f"key-{index}": (list(range(5000)), float(index))})
+            for index in range(8)
+        ])
+
+    asyncio.run(main())
+    assert len(json.loads(path.read_text())["entries"]) == 1
+    assert os.listdir(tmp_path) == ["catalog.json"]
+
+
+def test_a_slow_save_never_overwrites_a_newer_snapshot(tmp_path, monkeypatch):
+    path = tmp_path / "catalog.json"
+    cache = cache_for(path)
+    save = cache.save
+
+    def slow_first_save(entries):
+        if len(entries) == 1:
+            time.sleep(0.05)
+        save(entries)
+
+    monkeypatch.setattr(cache, "save", slow_first_save)
+
+    async def loader(value):
+        return value
+
+    async def main():
+        first = asyncio.create_task(cache.reload("moons", lambda: loader(["Phobos"])))
+        await asyncio.sleep(0.01)
+        await cache.reload("planets", lambda: loader(["Mars"]))
+        await first
+
+    asyncio.run(main())
+    assert set(json.loads(path.read_text())["entries"]) == {"moons", "planets"}
@@ -0,0 +1,142 @@
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+import time
+
+from utils.single_flight import SingleFlight
+
+
+class CatalogCache:
+    # In-memory catalog with TTL + stale-while-revalidate, persisted to an on-disk snapshot.
+    # In offline mode only the bundled data file is served and no loader is ever called.
+    def __init__(self, ttl: float, stale_ttl: float, snapshot_path: str = None, bundle_path: str = None, offline: bool = False):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.snapshot_path = snapshot_path
+        self.bundle_path = bundle_path
+        self.offline = offline
+        self.entries = {}
+        self.refreshing = {}
+        # Concurrent misses and background refreshes of a key share one upstream query
+        self.flight = SingleFlight()
+        # Snapshot saves run one at a time, so an older catalog never overwrites a newer one
+        self.save_lock = asyncio.Lock()
+        self.version = 0
+        self.saved_version = 0
+        self.counters = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+
+    # PERSISTENCE
+    def load(self):
+        path = self.bundle_path if self.offline else self.snapshot_path
+        if not path or not os.path.exists(path):
+            return
+        # A corrupt or truncated file must not keep the service from starting, it starts empty instead
+        try:
+            with open(path, "r") as file:
+                entries = {key: (entry["value"], entry.get("fetched_at") or 0) for key, entry in json.load(file).get("entries", {}).items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as exc:
+            print(f"Ignoring unreadable catalog file {path}: {exc!r}")
+            return
+        self.entries.update(entries)
+
+    def save(self, entries: dict):
+        if self.offline or not self.snapshot_path:
+            return
+        entries = {key: {"value": value, "fetched_at": fetched_at} for key, (value, fetched_at) in entries.items()}
+        # Write-then-rename so a crash never leaves a truncated snapshot behind. Each save gets its
+        # own temporary file, so concurrent calls never write into each other's.
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".catalog-", suffix=".tmp", dir=os.path.dirname(os.path.abspath(self.snapshot_path)))
+            with os.fdopen(fd, "w") as file:
+                json.dump({"entries": entries}, file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as exc:
+            print(f"Failed to write catalog snapshot: {exc}")
+            if tmp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+
+    # LOOKUP
+    async def get(self, key: str, loader):
+        entry = self.entries.get(key)
+
+        if self.offline:
+            if entry is None:
+                raise KeyError(key)
+            self.counters["hits"] += 1
+            return entry[0]
+
+        if entry is not None:
+            value, fetched_at = entry
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                self.counters["hits"] += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.counters["stale_hits"] += 1
+                self.refresh_in_background(key, loader)
+                return value
+
+        self.counters["misses"] += 1
+        try:
+            return await self.refresh(key, loader)
+        except Exception:
+            # Stale-if-error: an expired value beats no value while the upstream is down
+            if entry is not None:
+                return entry[0]
+            raise
+
+    async def refresh(self, key: str, loader):
+        return await self.flight.do(key, lambda: self.reload(key, loader))
+
+    async def reload(self, key: str, loader):
+        value = await loader()
+        self.entries[key] = (value, time.time())
+        self.counters["refreshes"] += 1
+        self.version += 1
+        await self.persist()
+        return value
+
+    async def persist(self):
+        async with self.save_lock:
+            # A save queued behind one that already wrote the latest entries has nothing left to do
+            if self.saved_version >= self.version:
+                return
+            version = self.version
+            # Snapshot writes stay off the event loop, on a copy the loop can keep mutating
+            await asyncio.to_thread(self.save, dict(self.entries))
+            self.saved_version = version
+
+    def refresh_in_background(self, key: str, loader):
+        if key in self.refreshing or self.flight.pending(key):
+            return
+
+        async def run():
+            try:
+                await self.refresh(key, loader)
+            except Exception as exc:
+                self.counters["refresh_errors"] += 1
+                print(f"Background refresh of '{key}' failed: {exc}")
+            finally:
+                self.refreshing.pop(key, None)
+
+        # Keep a reference so the task is not garbage collected mid-refresh
+        self.refreshing[key] = asyncio.create_task(run())
+
+    def stats(self) -> dict:
+        hits = self.counters["hits"] + self.counters["stale_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            "entries": len(self.entries),
+            "offline": self.offline,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            **self.counters,
+            "coalesced": self.flight.counters["coalesced"],
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,66 @@
+import asyncio
+import httpx
+
+from utils.metrics import track_upstream
+
+# Transient upstream statuses worth another attempt
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# A request that may have reached the upstream is only sent again when repeating it is harmless.
+# Anything else (e.g. POST /api/generate) is retried only if it never got through: a connect error,
+# or a status saying it was not processed. A read timeout may leave the upstream still working on it.
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+UNPROCESSED_STATUSES = {429, 503}
+
+
+class AsyncHTTPClient:
+    # Service-lifetime pooled httpx client with timeouts and retries on transient failures
+    def __init__(self, timeout: float = 30.0, retries: int = 2, backoff: float = 0.5, max_connections: int = 50, max_keepalive: int = 10, target: str = "http"):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.client = None
+        # Upstream name used in the latency metrics, e.g. "wikidata" or "ollama"
+        self.target = target
+
+    async def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(timeout=httpx.Timeout(self.timeout), limits=self.limits)
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def request(self, method: str, url: str, retries: int = None, **kwargs) -> httpx.Response:
+        if self.client is None:
+            await self.start()
+
+        retries = self.retries if retries is None else retries
+        # Timed as a whole, retries and backoff included, that is what the caller waits for
+        with track_upstream(self.target, method):
+            return await self.send_with_retries(method, url, retries, **kwargs)
+
+    async def send_with_retries(self, method: str, url: str, retries: int, **kwargs) -> httpx.Response:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_errors = httpx.TransportError if idempotent else UNSENT_ERRORS
+        retry_statuses = RETRY_STATUSES if idempotent else UNPROCESSED_STATUSES
+        for attempt in range(retries + 1):
+            last_attempt = attempt == retries
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except retry_errors:
+                if last_attempt:
+                    raise
+            else:
+                if response.status_code not in retry_statuses or last_attempt:
+                    return response
+            await asyncio.sleep(self.backoff * (2 ** attempt))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
@@ -0,0 +1,35 @@
+import asyncio
+
+
+class SingleFlight:
+    # Runs at most one call per key at a time: while a call is in flight, identical callers
+    # await its result instead of starting their own. The call runs as its own task, so a
+    # caller that goes away (e.g. a client disconnect) never cancels it for the others.
+    def __init__(self):
+        self.in_flight = {}
+        self.counters = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def pending(self, key) -> bool:
+        return key in self.in_flight
+
+    async def do(self, key, call):
+        self.counters["calls"] += 1
+        task = self.in_flight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+        else:
+            self.counters["executions"] += 1
+            task = asyncio.ensure_future(call())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self.finish(key, done))
+        return await asyncio.shield(task)
+
+    def finish(self, key, task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        # Retrieve the outcome so a call nobody is awaiting anymore does not log a warning
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self.in_flight), **self.counters}
@@ -0,0 +1,7 @@
+# Run from the service directory, like the service itself:
+#
+#   cd exploration-service && python -m pytest tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from utils.admission import AdmissionController
+
+
+def controller(**overrides) -> AdmissionController:
+    settings = {"max_in_flight": 1, "max_queue": 10, "max_queue_per_user": 5, "max_wait": 1.0}
+    return AdmissionController(**{**settings, **overrides})
+
+
+async def hold(admission: AdmissionController, release: asyncio.Event, user: str = "holder"):
+    async with admission.admit(user):
+        await release.wait()
+
+
+def test_queued_users_take_turns():
+    admission = controller()
+    order = []
+
+    async def job(user: str, name: str):
+        async with admission.admit(user):
+            order.append(name)
+
+    async def main():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(admission, release))
+        await asyncio.sleep(0)
+        jobs = [asyncio.ensure_future(job(user, name)) for user, name in [("heavy", "h1"), ("heavy", "h2"), ("heavy", "h3"), ("light", "l1"), ("other", "o1")]]
+        await asyncio.sleep(0)
+        assert admission.queued == 5
+        release.set()
+        await asyncio.gather(holder, *jobs)
+
+    asyncio.run(main())
+    assert order == ["h1", "l1", "o1", "h2", "h3"]
+    assert (admission.in_flight, admission.queued) == (0, 0)
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    admission = controller()
+    ran = []
+
+    async def job(user: str):
+        async with admission.admit(user):
+            ran.append(user)
+
+    async def main():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(admission, release))
+        await asyncio.sleep(0)
+        gone, waiting = asyncio.ensure_future(job("gone")), asyncio.ensure_future(job("waiting"))
+        await asyncio.sleep(0)
+        gone.cancel()
+        await asyncio.gather(gone, return_exceptions=True)
+        assert admission.queued == 1
+        release.set()
+        await asyncio.gather(holder, waiting)
+
+    asyncio.run(main())
+    assert ran == ["waiting"]
+    assert (admission.in_flight, admission.queued, admission.queues) == (0, 0, {})
+
+
+def test_slot_handed_to_a_cancelled_waiter_is_passed_on():
+    admission = controller()
+    ran = []
+
+    async def job(user: str):
+        async with admission.admit(user):
+            ran.append(user)
+
+    async def main():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(admission, release))
+        await asyncio.sleep(0)
+        first, second = asyncio.ensure_future(job("first")), asyncio.ensure_future(job("second"))
+        await asyncio.sleep(0)
+        release.set()
+        # The holder releases and hands its slot to "first", which goes away before resuming
+        await holder
+        first.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+
+    asyncio.run(main())
+    assert "second" in ran
+    assert (admission.in_flight, admission.queued) == (0, 0)
+
+
+def test_user_limit_is_shed_with_retry_after():
+    admission = controller(max_queue_per_user=1)
+
+    async def main():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(admission, release))
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(hold(admission, release, "ann"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as rejected:
+            admission.check("ann")
+        admission.check("bob")
+        release.set()
+        await asyncio.gather(holder, queued)
+        return rejected.value
+
+    rejected = asyncio.run(main())
+    assert rejected.status_code == 429
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert admission.counters["rejected_user_limit"] == 1
+
+
+def test_queue_wait_times_out():
+    admission = controller(max_wait=0.01)
+
+    async def main():
+        release = asyncio.Event()
+        holder = asyncio.ensure_future(hold(admission, release))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as rejected:
+            async with admission.admit("ann"):
+                pass
+        release.set()
+        await holder
+        return rejected.value
+
+    assert asyncio.run(main()).status_code == 429
+    assert admission.counters["rejected_timed_out"] == 1
+    assert (admission.in_flight, admission.queued) == (0, 0)
+
+
+def test_disabled_controller_never_queues():
+    admission = controller(max_in_flight=0)
+
+    async def main():
+        release = asyncio.Event()
+        holders = [asyncio.ensure_future(hold(admission, release)) for _ in range(20)]
+        await asyncio.sleep(0)
+        assert admission.queued == 0
+        release.set()
+        await asyncio.gather(*holders)
+
+    asyncio.run(main())
+    assert admission.counters["admitted"] == 0
@@ -0,0 +1,49 @@
+import asyncio
+import os
+
+from utils.image_cache import ImageCache
+
+
+def test_concurrent_misses_render_once(tmp_path):
+    cache = ImageCache(max_bytes=1024, directory=str(tmp_path))
+    renders = []
+
+    async def render():
+        renders.append(1)
+        await asyncio.sleep(0.01)
+        return b"image"
+
+    async def main():
+        return await asyncio.gather(*[cache.fetch("digest", render) for _ in range(5)])
+
+    assert asyncio.run(main()) == [b"image"] * 5
+    assert len(renders) == 1
+    assert cache.stats()["coalesced"] == 4
+
+
+def test_disk_is_trimmed_to_its_limit(tmp_path):
+    cache = ImageCache(max_bytes=0, directory=str(tmp_path), max_disk_bytes=250)
+
+    async def main():
+        for digest in ("a", "b", "c"):
+            await cache.put(digest, b"x" * 100)
+        # A disk hit makes "b" the most recently used file
+        assert await cache.get("b") == b"x" * 100
+        await cache.put("d", b"x" * 100)
+
+    asyncio.run(main())
+    assert sorted(os.listdir(tmp_path)) == ["b", "d"]
+    assert cache.stats()["disk_bytes"] == 200
+
+
+def test_start_indexes_and_trims_existing_files(tmp_path):
+    for index, digest in enumerate(("old", "new")):
+        path = tmp_path / digest
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (1000 + index, 1000 + index))
+    (tmp_path / "partial.123.tmp").write_bytes(b"x")
+    cache = ImageCache(max_bytes=1024, directory=str(tmp_path), max_disk_bytes=150)
+
+    asyncio.run(cache.start())
+    assert os.listdir(tmp_path) == ["new"]
+    assert cache.stats()["disk_entries"] == 1
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from utils.json_stream import JSONFieldStream
+
+DOCUMENT = json.dumps({
+    "name": "Zeta \"Prime\", {the} [first]",
+    "mass": 5.9e24,
+    "moons": [{"name": "a,b"}, {"name": "c}"}],
+    "path": "C:\\\\planets\\\\",
+    "civilization": "Crystalline hive minds",
+})
+
+
+def feed_all(chunks) -> tuple:
+    stream = JSONFieldStream()
+    fields = []
+    for chunk in chunks:
+        fields.extend(stream.feed(chunk))
+    return fields, stream
+
+
+@pytest.mark.parametrize("split", range(len(DOCUMENT) + 1))
+def test_fields_are_independent_of_chunk_boundaries(split):
+    fields, stream = feed_all([DOCUMENT[:split], DOCUMENT[split:]])
+    assert fields == list(json.loads(DOCUMENT).items())
+    assert stream.result() == json.loads(DOCUMENT)
+
+
+def test_single_character_chunks():
+    fields, _ = feed_all(DOCUMENT)
+    assert dict(fields) == json.loads(DOCUMENT)
+
+
+def test_fields_are_returned_as_soon_as_they_close():
+    stream = JSONFieldStream()
+    assert stream.feed('{"name": "Zeta", "ma') == [("name", "Zeta")]
+    assert stream.feed('ss": 1') == []
+    assert stream.feed("}") == [("mass", 1)]
+
+
+def test_malformed_pair_is_skipped_and_left_to_the_final_parse():
+    fields, stream = feed_all(['{"name": "Zeta", "mass": oops, "radius": 3}'])
+    assert fields == [("name", "Zeta"), ("radius", 3)]
+    with pytest.raises(json.JSONDecodeError):
+        stream.result()
+
+
+def test_trailing_text_after_the_object_is_ignored_by_fields():
+    fields, _ = feed_all(['{"name": "Zeta"}', ', "extra": 1}'])
+    assert fields == [("name", "Zeta")]
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+from fastapi import HTTPException
+
+from utils.planet_batcher import PlanetBatcher
+
+
+def run_batch(batch_latency: float, one_latency: float, deadline: float, valid: int = 1, requests: int = 3):
+    async def generate_batch(count):
+        await asyncio.sleep(batch_latency)
+        return [{"name": f"Planet {index}"} for index in range(valid)], count - valid
+
+    async def generate_one():
+        await asyncio.sleep(one_latency)
+        return {"name": "Fallback"}
+
+    batcher = PlanetBatcher(generate_batch, generate_one, max_batch_size=requests, window=0.01, deadline=deadline)
+
+    async def main():
+        return await asyncio.gather(*[batcher.submit() for _ in range(requests)], return_exceptions=True)
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    return results, time.perf_counter() - start, batcher
+
+
+def test_fallbacks_fill_the_batch_within_the_deadline():
+    results, _, batcher = run_batch(batch_latency=0.01, one_latency=0.01, deadline=1.0)
+    assert [result["name"] for result in results] == ["Planet 0", "Fallback", "Fallback"]
+    assert batcher.counters["fallbacks"] == 2
+
+
+def test_fallbacks_only_get_the_time_left():
+    results, elapsed, batcher = run_batch(batch_latency=0.1, one_latency=1.0, deadline=0.2)
+    assert results[0] == {"name": "Planet 0"}
+    assert all(isinstance(result, HTTPException) and result.status_code == 504 for result in results[1:])
+    assert elapsed < 0.5
+    assert batcher.counters["deadline_exceeded"] == 2
+
+
+def test_a_slow_batch_fails_every_request():
+    results, elapsed, batcher = run_batch(batch_latency=1.0, one_latency=0.01, deadline=0.1)
+    assert all(isinstance(result, HTTPException) and result.status_code == 504 for result in results)
+    assert elapsed < 0.5
+    assert batcher.counters["deadline_exceeded"] == 3
+
+
+def test_errors_outside_the_generation_reach_every_request():
+    async def generate_batch(count):
+        return None, 0
+
+    async def generate_one():
+        return {"name": "Fallback"}
+
+    batcher = PlanetBatcher(generate_batch, generate_one, max_batch_size=2, window=0.01)
+
+    async def main():
+        return await asyncio.wait_for(asyncio.gather(*[batcher.submit() for _ in range(2)], return_exceptions=True), 1.0)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, TypeError) for result in results)
+    assert batcher.tasks == set()
@@ -0,0 +1,157 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from fastapi import HTTPException
+
+import asyncio
+import statistics
+import time
+
+from utils.metrics import registry
+
+# Requests without X-Username share one queue
+ANONYMOUS = "anonymous"
+QUEUE_POSITION_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+ADMISSION_WAIT = registry.histogram("admission_wait_seconds", "Time a generation request waited for a slot", ["outcome"])
+ADMISSION_QUEUE_POSITION = registry.histogram("admission_queue_position", "Requests ahead of a generation request when it was queued", buckets=QUEUE_POSITION_BUCKETS)
+ADMISSION_REJECTIONS = registry.counter("admission_rejections_total", "Generation requests turned away", ["reason"])
+ADMISSION_STATE = registry.gauge("admission_requests", "Generation requests holding or waiting for a slot", ["state"])
+
+
+class AdmissionController:
+    # Caps in-flight generations at `max_in_flight`. Extra requests wait in per-user FIFO queues
+    # served round-robin, so one user's burst cannot starve the others. Requests that would not
+    # get a slot in time are turned away early with 429 + Retry-After instead of piling up.
+    def __init__(self, max_in_flight: int, max_queue: int, max_queue_per_user: int, max_wait: float, default_service_time: float = 10.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.max_wait = max_wait
+        self.default_service_time = default_service_time
+        self.in_flight = 0
+        self.queued = 0
+        self.queues = {}
+        self.turns = deque()
+        self.service_times = deque(maxlen=50)
+        self.counters = {"admitted": 0, "enqueued": 0, "rejected_queue_full": 0, "rejected_user_limit": 0, "rejected_timed_out": 0}
+        ADMISSION_STATE.track(lambda: self.in_flight, state="in_flight")
+        ADMISSION_STATE.track(lambda: self.queued, state="queued")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    def service_time(self) -> float:
+        return statistics.median(self.service_times) if self.service_times else self.default_service_time
+
+    def retry_after(self) -> int:
+        # Roughly when the work already admitted or queued will have drained
+        return max(1, round(self.service_time() * (self.in_flight + self.queued) / self.max_in_flight))
+
+    def reject(self, reason: str, detail: str):
+        self.counters[f"rejected_{reason}"] += 1
+        ADMISSION_REJECTIONS.inc(reason=reason)
+        raise HTTPException(status_code=429, detail=detail, headers={"Retry-After": str(self.retry_after())})
+
+    def check(self, user: str = None):
+        # Sheds a request that could not even be queued, before any work starts
+        if not self.enabled or self.in_flight < self.max_in_flight and not self.queued:
+            return
+        user = user or ANONYMOUS
+        if self.queued >= self.max_queue:
+            self.reject("queue_full", "Too many planets are being explored right now, try again later")
+        if len(self.queues.get(user, ())) >= self.max_queue_per_user:
+            self.reject("user_limit", "You already have explorations waiting, try again later")
+
+    def position(self, user: str) -> int:
+        # Round-robin position: every other user gets a turn before each of this user's earlier requests
+        mine = len(self.queues[user])
+        return sum(min(len(queue), mine) for other, queue in self.queues.items() if other != user) + mine - 1
+
+    @asynccontextmanager
+    async def admit(self, user: str = None):
+        if not self.enabled:
+            yield
+            return
+
+        user = user or ANONYMOUS
+        start = time.perf_counter()
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self.in_flight += 1
+        else:
+            await self.wait_for_turn(user)
+        admitted_at = time.perf_counter()
+        ADMISSION_WAIT.observe(admitted_at - start, outcome="admitted")
+        self.counters["admitted"] += 1
+
+        try:
+            yield
+        finally:
+            self.service_times.append(time.perf_counter() - admitted_at)
+            self.release()
+
+    async def wait_for_turn(self, user: str):
+        self.check(user)
+        future = asyncio.get_running_loop().create_future()
+        if user not in self.queues:
+            self.queues[user] = deque()
+            self.turns.append(user)
+        self.queues[user].append(future)
+        self.queued += 1
+        self.counters["enqueued"] += 1
+        ADMISSION_QUEUE_POSITION.observe(self.position(user))
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.drop(user, future)
+            ADMISSION_WAIT.observe(time.perf_counter() - start, outcome="timed_out")
+            self.reject("timed_out", "Timed out waiting for a free planet generator, try again later")
+        except asyncio.CancelledError:
+            # A slot handed over just before the caller went away must be passed on
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self.drop(user, future)
+            raise
+
+    def drop(self, user: str, future):
+        queue = self.queues.get(user)
+        if queue is None or future not in queue:
+            return
+        queue.remove(future)
+        self.queued -= 1
+        if not queue:
+            del self.queues[user]
+            self.turns.remove(user)
+
+    def release(self):
+        # The slot goes straight to the next user in turn, so in_flight never dips below the cap
+        while self.turns:
+            user = self.turns.popleft()
+            queue = self.queues[user]
+            future = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self.turns.append(user)
+            else:
+                del self.queues[user]
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "max_queue_per_user": self.max_queue_per_user,
+            "max_wait_s": self.max_wait,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "queued_users": len(self.queues),
+            **self.counters,
+            "service_time_s": round(self.service_time(), 3),
+        }
@@ -0,0 +1,103 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+
+import os
+
+from utils.metrics import timed_upstream
+
+# GLOBAL
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "100"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "5"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "60000"))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+
+# INDEXES
+# Per-user listings filter on username and page on _id; the _id index already serves /latest
+PLANET_INDEXES = [
+    IndexModel([("username", ASCENDING), ("_id", ASCENDING)], name="username_id"),
+    IndexModel([("name", ASCENDING)], name="name"),
+]
+
+
+def create_client(mongodb_url: str) -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        mongodb_url,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        minPoolSize=MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+    )
+
+
+class PlanetRepository:
+    # Async data-access layer over the planets collection. Any motor-compatible
+    # collection works, e.g. mongomock_motor's for local runs without a mongod.
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, query: dict = None, projection: dict = None, after: str = None, limit: int = None):
+        # Keyset pagination on _id: ids are ObjectId hex strings, so their order is insertion order
+        query = dict(query or {})
+        if after is not None:
+            query["_id"] = {"$gt": after}
+        cursor = self.collection.find(query, projection).sort("_id", 1)
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        return cursor
+
+    @timed_upstream("mongodb")
+    async def find_page(self, query: dict = None, projection: dict = None, after: str = None, limit: int = None) -> list:
+        return await self.find(query, projection, after, limit).to_list(length=limit)
+
+    async def ensure_indexes(self):
+        await self.collection.create_indexes(PLANET_INDEXES)
+
+    async def index_stats(self) -> list:
+        stats = await self.collection.aggregate([{"$indexStats": {}}]).to_list(length=None)
+        return [
+            {
+                "name": index["name"],
+                "key": dict(index["key"]),
+                "ops": index["accesses"]["ops"],
+                "since": index["accesses"]["since"].isoformat(),
+            }
+            for index in stats
+        ]
+
+    async def slow_queries(self, limit: int = 20) -> list:
+        # Profiling is enabled by mongod itself (--profile/--slowms), the app user can only read it
+        profile = self.collection.database["system.profile"]
+        cursor = profile.find({"ns": self.collection.full_name}).sort("ts", -1).limit(limit)
+        return [
+            {
+                "op": entry.get("op"),
+                "command": str(entry.get("command", entry.get("query"))),
+                "millis": entry.get("millis"),
+                "plan": entry.get("planSummary"),
+                "docs_examined": entry.get("docsExamined"),
+                "returned": entry.get("nreturned"),
+                "ts": entry["ts"].isoformat() if "ts" in entry else None,
+            }
+            async for entry in cursor
+        ]
+
+    @timed_upstream("mongodb")
+    async def find_by_id(self, planet_id: str):
+        return await self.collection.find_one({"_id": planet_id})
+
+    @timed_upstream("mongodb")
+    async def find_latest(self, limit: int = 10) -> list:
+        return await self.collection.find().sort("_id", -1).limit(limit).to_list(length=limit)
+
+    @timed_upstream("mongodb")
+    async def update(self, planet_id: str, planet_data: dict):
+        return await self.collection.find_one_and_update(
+            {"_id": planet_id},
+            {"$set": planet_data},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @timed_upstream("mongodb")
+    async def insert(self, planet_data: dict):
+        result = await self.collection.insert_one(planet_data)
+        return result.inserted_id
@@ -0,0 +1,174 @@
+from collections import OrderedDict
+
+import asyncio
+import contextlib
+import hashlib
+import os
+
+from utils.single_flight import SingleFlight
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison, as If-None-Match calls for
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class ImageCache:
+    # Content-addressed image cache: a byte-bounded in-memory LRU in front of a byte-bounded LRU
+    # directory on disk. Keys fully determine the rendered bytes, so their digest doubles as a
+    # strong ETag. Concurrent misses for the same image share one render.
+    def __init__(self, max_bytes: int, directory: str = None, max_disk_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        # digest -> file size on disk, least recently used first; only touched on the event loop
+        self.disk_entries = OrderedDict()
+        self.disk_size = 0
+        self.flight = SingleFlight()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+
+    @staticmethod
+    def digest(key: tuple) -> str:
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    async def start(self):
+        # Picks up the files a previous run left behind, oldest first, and trims them to the limit
+        if not self.directory:
+            return
+        for digest, size in await asyncio.to_thread(self.scan):
+            self.index(digest, size)
+        await self.evict_disk()
+
+    async def fetch(self, digest: str, render):
+        # Returns the cached image, rendering and storing it on a miss
+        content = await self.get(digest)
+        if content is not None:
+            return content
+        return await self.flight.do(digest, lambda: self.fill(digest, render))
+
+    async def fill(self, digest: str, render) -> bytes:
+        content = await render()
+        await self.put(digest, content)
+        return content
+
+    async def get(self, digest: str):
+        content = self.entries.get(digest)
+        if content is not None:
+            self.entries.move_to_end(digest)
+            self.counters["memory_hits"] += 1
+            return content
+
+        if self.directory:
+            content = await asyncio.to_thread(self.read, digest)
+            if content is not None:
+                self.counters["disk_hits"] += 1
+                self.index(digest, len(content))
+                self.remember(digest, content)
+                return content
+
+        self.counters["misses"] += 1
+        return None
+
+    async def put(self, digest: str, content: bytes):
+        self.remember(digest, content)
+        if self.directory and await asyncio.to_thread(self.write, digest, content):
+            self.index(digest, len(content))
+            await self.evict_disk()
+
+    def remember(self, digest: str, content: bytes):
+        if len(content) > self.max_bytes:
+            return
+        if digest in self.entries:
+            self.size -= len(self.entries.pop(digest))
+        self.entries[digest] = content
+        self.size += len(content)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.counters["evictions"] += 1
+
+    def index(self, digest: str, size: int):
+        self.disk_size -= self.disk_entries.pop(digest, 0)
+        self.disk_entries[digest] = size
+        self.disk_size += size
+
+    async def evict_disk(self):
+        evicted = []
+        while self.max_disk_bytes and self.disk_size > self.max_disk_bytes and self.disk_entries:
+            digest, size = self.disk_entries.popitem(last=False)
+            self.disk_size -= size
+            evicted.append(digest)
+        if evicted:
+            self.counters["disk_evictions"] += len(evicted)
+            await asyncio.to_thread(self.remove, evicted)
+
+    def scan(self) -> list:
+        # (digest, size) of the cached files by last use; leftover temporary files are removed
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        files = []
+        for name in names:
+            path = self.path(name)
+            try:
+                if name.endswith(".tmp"):
+                    os.remove(path)
+                    continue
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+        return [(name, size) for _, name, size in sorted(files)]
+
+    def read(self, digest: str):
+        try:
+            with open(self.path(digest), "rb") as file:
+                content = file.read()
+        except FileNotFoundError:
+            return None
+        # The modification time records the last use, so the next start keeps the LRU order
+        with contextlib.suppress(OSError):
+            os.utime(self.path(digest))
+        return content
+
+    def write(self, digest: str, content: bytes) -> bool:
+        # Write-then-rename so concurrent readers never see a partial file
+        tmp_path = f"{self.path(digest)}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "wb") as file:
+                file.write(content)
+            os.replace(tmp_path, self.path(digest))
+            return True
+        except OSError as exc:
+            print(f"Failed to write cached image: {exc}")
+            return False
+
+    def remove(self, digests: list):
+        for digest in digests:
+            with contextlib.suppress(OSError):
+                os.remove(self.path(digest))
+
+    def stats(self) -> dict:
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "disk_entries": len(self.disk_entries),
+            "disk_bytes": self.disk_size,
+            "max_disk_bytes": self.max_disk_bytes,
+            **self.counters,
+            "coalesced": self.flight.counters["coalesced"],
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
@@ -1,20 +1,32 @@
 from PIL import Image, ImageDraw
 
+import numpy as np
 import random
 import io
 
-def generate_planet_image(color_base: str, color_extra: str):
+SPACE_COLOR = (0x0d, 0x1b, 0x2a)  # Dark space color
+STAR_COLOR = (255, 255, 255)
+STARS_PER_512_SQUARE = 100
+BORDER_WIDTH = 4
+
+
+def hex_to_rgb(color: str):
+    return int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)
+
+
+def render_planet_image(color_base: str, color_extra: str, size: int = 512, seed: int = None) -> Image.Image:
     # Dimensions
-    width, height = 512, 512
+    width, height = size, size
+    rng = random.Random(seed) if seed is not None else random
 
-    img = Image.new("RGB", (width, height), "#0d1b2a")  # Dark space color
-    draw = ImageDraw.Draw(img)
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[:] = SPACE_COLOR
 
-    # Starry background
-    num_stars = 100
+    # Starry background, same density as the original 100 stars on 512x512
+    num_stars = max(1, STARS_PER_512_SQUARE * width * height // (512 * 512))
     for _ in range(num_stars):
-        x, y = random.randint(0, width - 1), random.randint(0, height - 1)
-        draw.point((x, y), fill="white")
+        x, y = rng.randint(0, width - 1), rng.randint(0, height - 1)
+        pixels[y, x] = STAR_COLOR
 
     # Planet
     planet_diameter = width // 3
@@ -22,33 +34,41 @@ def generate_planet_image(color_base: str, color_extra: str):
     planet_x = (width - planet_diameter) // 2
     planet_y = (height - planet_diameter) // 2
 
-    # Gradient
-    for x_offset in range(planet_diameter):
-        for y_offset in range(planet_diameter):
-            # Calculate the blend ratio based on diagonal distance from top-left to bottom-right
-            distance_ratio = (x_offset + y_offset) / (2 * planet_diameter)
-            blended_color = (
-                int(int(color_base[1:3], 16) * (1 - distance_ratio) + int(color_extra[1:3], 16) * distance_ratio),
-                int(int(color_base[3:5], 16) * (1 - distance_ratio) + int(color_extra[3:5], 16) * distance_ratio),
-                int(int(color_base[5:7], 16) * (1 - distance_ratio) + int(color_extra[5:7], 16) * distance_ratio),
-            )
-            # Draw only within the circular boundary
-            if (x_offset - planet_radius) ** 2 + (y_offset - planet_radius) ** 2 <= planet_radius ** 2:
-                draw.point((planet_x + x_offset, planet_y + y_offset), fill=blended_color)
+    # Gradient, blended along the diagonal from top-left to bottom-right, indexed [y, x]
+    offsets = np.arange(planet_diameter)
+    distance_ratio = ((offsets[:, None] + offsets[None, :]) / (2 * planet_diameter))[..., None]
+    base = np.array(hex_to_rgb(color_base), dtype=np.float64)
+    extra = np.array(hex_to_rgb(color_extra), dtype=np.float64)
+    # Same operation order as the per-pixel version, so truncation gives identical bytes
+    gradient = (base * (1 - distance_ratio) + extra * distance_ratio).astype(np.uint8)
+
+    # Circular mask
+    mask = (offsets[None, :] - planet_radius) ** 2 + (offsets[:, None] - planet_radius) ** 2 <= planet_radius ** 2
+    planet_area = pixels[planet_y:planet_y + planet_diameter, planet_x:planet_x + planet_diameter]
+    planet_area[mask] = gradient[mask]
+
+    img = Image.fromarray(pixels, "RGB")
 
     # Border
-    border_width = 4
-    border_color = "black"
+    draw = ImageDraw.Draw(img)
     draw.ellipse(
         [
-            (planet_x - border_width, planet_y - border_width),
-            (planet_x + planet_diameter + border_width, planet_y + planet_diameter + border_width),
+            (planet_x - BORDER_WIDTH, planet_y - BORDER_WIDTH),
+            (planet_x + planet_diameter + BORDER_WIDTH, planet_y + planet_diameter + BORDER_WIDTH),
         ],
-        outline=border_color,
-        width=border_width,
+        outline="black",
+        width=BORDER_WIDTH,
     )
 
+    return img
+
+
+def generate_planet_image(color_base: str, color_extra: str, size: int = 512, image_format: str = "PNG", seed: int = None):
+    img = render_planet_image(color_base, color_extra, size=size, seed=seed)
+
     image_bytes = io.BytesIO()
-    img.save(image_bytes, format="PNG")
+    # Lossless WebP keeps the pixels identical to the PNG output, method 0 is the fastest encoder
+    options = {"lossless": True, "method": 0} if image_format.upper() == "WEBP" else {}
+    img.save(image_bytes, format=image_format.upper(), **options)
 
     return image_bytes.getvalue()
@@ -0,0 +1,58 @@
+import json
+
+
+class JSONFieldStream:
+    # Incremental parser for a JSON object arriving in arbitrary text chunks (e.g. LLM tokens).
+    # Each top-level "key": value pair is returned as soon as its closing ',' or '}' is seen.
+    def __init__(self):
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.segment_start = None
+        self.complete = False
+
+    def feed(self, text: str) -> list:
+        fields = []
+        for char in text:
+            self.buffer.append(char)
+            if self.complete:
+                continue
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                if self.depth == 1:
+                    self.segment_start = len(self.buffer)
+            elif char in "}]":
+                if self.depth == 1:
+                    fields.extend(self.close_segment())
+                    self.complete = True
+                self.depth -= 1
+            elif char == "," and self.depth == 1:
+                fields.extend(self.close_segment())
+                self.segment_start = len(self.buffer)
+        return fields
+
+    def close_segment(self) -> list:
+        segment = "".join(self.buffer[self.segment_start:-1]).strip()
+        if not segment:
+            return []
+        try:
+            return list(json.loads("{" + segment + "}").items())
+        except json.JSONDecodeError:
+            # Malformed pair, the final parse of the whole document reports it
+            return []
+
+    def result(self) -> dict:
+        return json.loads("".join(self.buffer))
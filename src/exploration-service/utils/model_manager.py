@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+
+def same_model(name: str, model: str) -> bool:
+    # Ollama reports untagged models as "<name>:latest"
+    def normalize(value: str) -> str:
+        return value if ":" in value else f"{value}:latest"
+    return normalize(name) == normalize(model)
+
+
+class ModelManager:
+    # Gets the Ollama model ready in the background so startup never waits on it:
+    # detect the model, pull it only when missing, then load it into memory with a one-token
+    # warm-up generation kept resident by `keep_alive`. Failed attempts are retried.
+    def __init__(self, http_client, ollama_url: str, model: str, keep_alive: str = "30m", warmup: bool = True, retry_delay: float = 5.0, on_ready=None):
+        self.http_client = http_client
+        self.ollama_url = ollama_url
+        self.model = model
+        self.keep_alive = keep_alive
+        self.warmup = warmup
+        self.retry_delay = retry_delay
+        self.on_ready = on_ready
+        self.state = "starting"
+        self.error = None
+        self.attempts = 0
+        self.pulled = False
+        self.started_at = None
+        self.timings = {}
+        self.task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self):
+        if self.task is None:
+            self.started_at = time.perf_counter()
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def run(self):
+        while True:
+            self.attempts += 1
+            try:
+                await self.prepare()
+            except Exception as exc:
+                self.state = "failed"
+                self.error = str(exc) or exc.__class__.__name__
+                print(f"Model {self.model} is not ready, retrying in {self.retry_delay}s: {self.error}")
+                await asyncio.sleep(self.retry_delay)
+                continue
+
+            self.state = "ready"
+            self.error = None
+            self.timings["ready_s"] = self.elapsed()
+            if self.on_ready is not None:
+                self.on_ready()
+            return
+
+    async def prepare(self):
+        self.state = "checking"
+        if not await self.model_present():
+            self.state = "pulling"
+            await self.pull()
+            self.pulled = True
+            self.timings["pulled_s"] = self.elapsed()
+        if self.warmup:
+            self.state = "warming"
+            await self.warm_up()
+            self.timings["warmed_s"] = self.elapsed()
+
+    async def model_present(self) -> bool:
+        response = await self.http_client.get(f"{self.ollama_url}/api/tags")
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to retrieve models from Ollama ({response.status_code})")
+        models = response.json().get("models", [])
+        return any(same_model(entry.get("name") or entry.get("model", ""), self.model) for entry in models)
+
+    async def pull(self):
+        # Pulls can take minutes, so no timeout here
+        response = await self.http_client.post(
+            f"{self.ollama_url}/api/pull", json={"name": self.model, "stream": False}, timeout=None
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to pull {self.model} ({response.status_code})")
+
+    async def warm_up(self):
+        # Loading the weights is the slow part of a cold first request, a single token is enough
+        response = await self.http_client.post(
+            f"{self.ollama_url}/api/generate",
+            json={"model": self.model, "prompt": "Hello", "stream": False, "keep_alive": self.keep_alive, "options": {"num_predict": 1}},
+            timeout=None,
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"Warm-up generation failed ({response.status_code})")
+
+    def elapsed(self) -> float:
+        return round(time.perf_counter() - self.started_at, 3)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "model": self.model,
+            "keep_alive": self.keep_alive,
+            "pulled": self.pulled,
+            "attempts": self.attempts,
+            "error": self.error,
+            "timings_s": self.timings,
+        }
@@ -0,0 +1,133 @@
+from fastapi import HTTPException
+
+import asyncio
+
+
+class PlanetBatcher:
+    # Collects concurrent generation requests for up to `window` seconds (or until `max_batch_size`
+    # are waiting) and serves them all from a single multi-planet LLM call. Requests the batch
+    # could not fill, e.g. because the model returned fewer valid planets, fall back to `generate_one`.
+    # The batch call and any fallback share one `deadline` (seconds), so a request never waits for
+    # more than one generation timeout in total.
+    def __init__(self, generate_batch, generate_one, max_batch_size: int = 4, window: float = 0.05, deadline: float = None):
+        self.generate_batch = generate_batch
+        self.generate_one = generate_one
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.deadline = deadline
+        self.waiting = []
+        self.flush_task = None
+        self.tasks = set()
+        self.counters = {"requests": 0, "batches": 0, "batched_planets": 0, "invalid_planets": 0, "fallbacks": 0, "deadline_exceeded": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch_size > 1
+
+    async def submit(self) -> dict:
+        if not self.enabled:
+            return await self.generate_one()
+
+        self.counters["requests"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.append(future)
+
+        if len(self.waiting) >= self.max_batch_size:
+            self.start_flush(delay=0)
+        elif self.flush_task is None:
+            self.start_flush(delay=self.window)
+
+        return await future
+
+    def start_flush(self, delay: float):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+        self.flush_task = self.spawn(self.flush(delay))
+
+    def spawn(self, coroutine, futures: list = ()) -> asyncio.Task:
+        # Keep a reference so the task is not garbage collected mid-generation
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        if futures:
+            task.add_done_callback(lambda task: self.fail_pending(task, futures))
+        return task
+
+    @staticmethod
+    def fail_pending(task: asyncio.Task, futures: list):
+        # Whatever ended the task early reaches its waiters instead of leaving them hanging
+        if task.cancelled():
+            error = HTTPException(status_code=503, detail="Planet generation was cancelled, try again later")
+        else:
+            error = task.exception()
+        if error is None:
+            return
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
+
+    async def flush(self, delay: float):
+        if delay:
+            await asyncio.sleep(delay)
+        batch, self.waiting = self.waiting[:self.max_batch_size], self.waiting[self.max_batch_size:]
+        self.flush_task = None
+        if self.waiting:
+            self.start_flush(delay=0 if len(self.waiting) >= self.max_batch_size else self.window)
+        # Run detached, so cancelling a pending flush never cancels a batch already sent
+        self.spawn(self.run_batch(batch), batch)
+
+    async def run_batch(self, batch: list):
+        batch = [future for future in batch if not future.done()]
+        if not batch:
+            return
+
+        self.counters["batches"] += 1
+        deadline = asyncio.get_running_loop().time() + self.deadline if self.deadline else None
+        try:
+            planets, invalid = await self.within(deadline, self.generate_batch(len(batch)), len(batch))
+        except Exception as exc:
+            # A failed call fails the whole batch, retrying one by one would only pile onto the LLM
+            for future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.counters["batched_planets"] += len(planets)
+        self.counters["invalid_planets"] += invalid
+
+        for future, planet in zip(batch, planets):
+            if not future.done():
+                future.set_result(planet)
+
+        for future in batch[len(planets):]:
+            self.counters["fallbacks"] += 1
+            self.spawn(self.fallback(future, deadline), [future])
+
+    async def within(self, deadline: float, call, requests: int = 1):
+        # Awaits `call` until the deadline, cancelling it (and the LLM request) once it has passed
+        if deadline is None:
+            return await call
+        try:
+            return await asyncio.wait_for(call, max(0.0, deadline - asyncio.get_running_loop().time()))
+        except asyncio.TimeoutError:
+            self.counters["deadline_exceeded"] += requests
+            raise HTTPException(status_code=504, detail="Timed out generating the planet, try again later")
+
+    async def fallback(self, future, deadline: float = None):
+        try:
+            planet = await self.within(deadline, self.generate_one())
+        except Exception as exc:
+            if not future.done():
+                future.set_exception(exc)
+            return
+        if not future.done():
+            future.set_result(planet)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "max_batch_size": self.max_batch_size,
+            "window_s": self.window,
+            "waiting": len(self.waiting),
+            **self.counters,
+            "avg_batch_size": round(self.counters["batched_planets"] / self.counters["batches"], 2) if self.counters["batches"] else 0.0,
+        }
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections import deque
+
+
+class PlanetPool:
+    # Buffer of pre-generated, validated planets kept full by a bounded set of background workers
+    def __init__(self, generate, size: int = 5, workers: int = 1, retry_delay: float = 5.0):
+        self.generate = generate
+        self.size = size
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.planets = deque()
+        self.in_progress = 0
+        self.slot_freed = None
+        self.tasks = []
+        self.latencies = deque(maxlen=100)
+        self.generated_at = deque(maxlen=100)
+        self.counters = {"generated": 0, "failed": 0, "claimed": 0, "empty": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0 and self.workers > 0
+
+    def start(self):
+        if not self.enabled or self.tasks:
+            return
+        self.slot_freed = asyncio.Event()
+        self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def worker(self):
+        while True:
+            # Planets being generated count towards the size, so the pool never overfills
+            while len(self.planets) + self.in_progress >= self.size:
+                self.slot_freed.clear()
+                await self.slot_freed.wait()
+
+            self.in_progress += 1
+            start = time.perf_counter()
+            try:
+                planet = await self.generate()
+            except Exception as exc:
+                self.counters["failed"] += 1
+                print(f"Planet pre-generation failed: {exc}")
+                await asyncio.sleep(self.retry_delay)
+                continue
+            else:
+                self.planets.append(planet)
+                self.latencies.append(time.perf_counter() - start)
+                self.generated_at.append(time.time())
+                self.counters["generated"] += 1
+            finally:
+                self.in_progress -= 1
+
+    def claim(self):
+        if not self.enabled:
+            return None
+        if not self.planets:
+            self.counters["empty"] += 1
+            return None
+        self.counters["claimed"] += 1
+        if self.slot_freed is not None:
+            self.slot_freed.set()
+        return self.planets.popleft()
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        window = self.generated_at[-1] - self.generated_at[0] if len(self.generated_at) > 1 else 0
+        return {
+            "enabled": self.enabled,
+            "depth": len(self.planets),
+            "size": self.size,
+            "workers": self.workers,
+            "in_progress": self.in_progress,
+            **self.counters,
+            "hit_ratio": self.counters["claimed"] / (self.counters["claimed"] + self.counters["empty"]) if self.counters["claimed"] + self.counters["empty"] else 0.0,
+            "refill_per_minute": round((len(self.generated_at) - 1) / window * 60, 2) if window else 0.0,
+            "generation_latency_s": {
+                "last": round(self.latencies[-1], 3) if self.latencies else 0.0,
+                "p50": round(latencies[len(latencies) // 2], 3) if latencies else 0.0,
+                "max": round(latencies[-1], 3) if latencies else 0.0,
+            },
+        }
@@ -1,7 +1,21 @@
 db = db.getSiblingDB('exploration_db');
 
+// Read-only access to index usage and the profiler output for /admin/db-stats, instead of dbAdmin.
+// Profiling itself is enabled by mongod's --profile/--slowms flags in docker-compose.
+db.createRole({
+  role: "planetStats",
+  privileges: [
+    { resource: { db: "exploration_db", collection: "planets" }, actions: ["indexStats"] },
+    { resource: { db: "exploration_db", collection: "system.profile" }, actions: ["find"] }
+  ],
+  roles: []
+});
+
 db.createUser({
   user: "mongo_user",
   pwd: "mongo_pass",
-  roles: [{ role: "readWrite", db: "exploration_db" }]
-});
\ No newline at end of file
+  roles: [
+    { role: "readWrite", db: "exploration_db" }, // Includes createIndex for the startup index check
+    { role: "planetStats", db: "exploration_db" }
+  ]
+});
@@ -0,0 +1,22 @@
+# Each service is its own Docker build context, so modules they share are copied, not imported.
+# These checks keep the copies from drifting apart; edit one, then copy it over the others.
+#
+#   python -m pytest tests
+import filecmp
+import os
+
+import pytest
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SHARED_MODULES = {
+    "utils/metrics.py": ["api-gateway", "celestial-collection", "exploration-service"],
+    "utils/single_flight.py": ["api-gateway", "celestial-collection", "exploration-service"],
+}
+
+
+@pytest.mark.parametrize("module, services", SHARED_MODULES.items())
+def test_shared_module_copies_are_identical(module, services):
+    source, *copies = [os.path.join(SRC_DIR, service, module) for service in services]
+    drifted = [copy for copy in copies if not filecmp.cmp(source, copy, shallow=False)]
+    assert not drifted, f"{module} differs from {source} in: {', '.join(drifted)}"